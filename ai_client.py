@@ -0,0 +1,167 @@
+﻿"""异步AI客户端：聊天请求在同一个后台asyncio事件循环中执行，可随时取消"""
+import asyncio
+import threading
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from ai_executor import KIND_CHAT, PRIORITY_USER, RequestExecutor
+from ai_handler import CHAT_TIMEOUT, CONNECT_TIMEOUT, parse_sse_line
+from request_cancel import RequestCancel
+
+
+class AsyncAIClient:
+    """在后台事件循环中执行AIChatHandler的聊天请求
+
+    同一时间只保留一个聊天请求：提交新请求或调用cancel()会取消进行中的请求。
+    安装了aiohttp时直接用异步HTTP；否则以用户优先级把chat_stream提交到共用的
+    RequestExecutor。两种方式取消时都会立即关闭请求的连接（正在建立的连接
+    最多等连接超时），被取消的请求不会回调，也不会写入聊天历史。
+    """
+
+    def __init__(self, handler, executor=None):
+        self.handler = handler
+        self.executor = executor if executor is not None else RequestExecutor()
+        self.loop = asyncio.new_event_loop()
+        self._current = None  # (concurrent.futures.Future, RequestCancel)
+        self._lock = threading.Lock()
+        self._http = None  # aiohttp.ClientSession，在事件循环中创建
+        self._thread = threading.Thread(target=self._run_loop, name="ai-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def chat(self, message, on_delta, on_done, stream=True):
+        """提交聊天请求（任意线程可调用），并取消仍在进行的上一条
+
+        on_delta(text)在收到每段回复时调用，on_done(reply)在完成后调用，
+        两者都在后台线程中执行。
+        """
+        cancel_event = RequestCancel()
+        future = asyncio.run_coroutine_threadsafe(
+            self._chat(message, on_delta, on_done, stream, cancel_event), self.loop
+        )
+        with self._lock:
+            previous, self._current = self._current, (future, cancel_event)
+        if previous is not None:
+            self._cancel(previous)
+        return future
+
+    def cancel(self):
+        """取消进行中的聊天请求"""
+        with self._lock:
+            current, self._current = self._current, None
+        if current is not None:
+            self._cancel(current)
+
+    def close(self):
+        """取消请求并停止事件循环"""
+        self.cancel()
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._close_http(), self.loop)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    @staticmethod
+    def _cancel(request):
+        future, cancel_event = request
+        cancel_event.set()
+        future.cancel()
+
+    async def _chat(self, message, on_delta, on_done, stream, cancel_event):
+        def guarded_delta(text):
+            if not cancel_event.is_set():
+                on_delta(text)
+
+        try:
+            if aiohttp is not None:
+                reply = await self._chat_aiohttp(message, guarded_delta, stream)
+            else:
+                reply = await self._chat_in_thread(message, guarded_delta, stream, cancel_event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"异步聊天请求出错: {e}")
+            reply = None
+        if not cancel_event.is_set():
+            on_done(reply)
+        return reply
+
+    async def _chat_in_thread(self, message, on_delta, stream, cancel_event):
+        """没有aiohttp时：在共用的请求执行器中运行阻塞的chat_stream"""
+        future = self.executor.submit(
+            KIND_CHAT,
+            lambda: self.handler.chat_stream(
+                message, on_delta, stream=stream, cancel_event=cancel_event
+            ),
+            priority=PRIORITY_USER,
+        )
+        if future is None:
+            print("AI请求队列已满，消息未发送")
+            return None
+        try:
+            return await asyncio.wrap_future(future, loop=self.loop)
+        except asyncio.CancelledError:
+            # 还在排队的请求直接出队；执行中的请求连接被关闭后很快返回，
+            # 这里先让出它的名额，新消息不必排在它后面
+            cancel_event.set()
+            if not future.cancel():
+                self.executor.abandon(future)
+            raise
+
+    async def _get_http(self):
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession()
+        return self._http
+
+    async def _close_http(self):
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+
+    async def _chat_aiohttp(self, message, on_delta, stream):
+        """用aiohttp发送请求并解析SSE流，任务取消时连接随之关闭"""
+        handler = self.handler
+        payload = handler.chat_payload(handler.build_chat_messages(message), stream=stream)
+        cached = handler.cached_reply(payload)
+        if cached:
+            on_delta(cached)
+            handler.record_exchange(message, cached)
+            return cached
+        connect_timeout, read_timeout = handler.request_timeout("get_chat_timeout", CHAT_TIMEOUT)
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout or CONNECT_TIMEOUT, sock_read=read_timeout
+        )
+        session = await self._get_http()
+        parts = []
+        async with session.post(
+            f"{handler.base_url}/chat/completions",
+            headers=handler.chat_headers(),
+            json=payload,
+            timeout=timeout,
+        ) as response:
+            if response.status != 200:
+                print(f"API请求失败: {response.status} - {await response.text()}")
+                return None
+            if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                result = await response.json(content_type=None)
+                reply = result["choices"][0]["message"]["content"]
+                parts.append(reply)
+                on_delta(reply)
+            else:
+                async for raw_line in response.content:
+                    done, delta = parse_sse_line(raw_line.decode("utf-8").strip())
+                    if done:
+                        break
+                    if delta:
+                        parts.append(delta)
+                        on_delta(delta)
+
+        reply = "".join(parts)
+        if not reply:
+            return None
+        handler.cache_reply(payload, reply)
+        handler.record_exchange(message, reply)
+        return reply
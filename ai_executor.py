@@ -0,0 +1,164 @@
+﻿"""AI请求执行器：所有AI调用共用的有界队列，按类型限制并发、按优先级调度"""
+import threading
+from concurrent.futures import Future
+
+# 请求类型
+KIND_CHAT = "chat"
+KIND_VL = "vl"
+# 优先级：数值越小越先执行
+PRIORITY_USER = 0  # 用户输入的聊天
+PRIORITY_BACKGROUND = 10  # 后台截图分析等
+
+DEFAULT_MAX_WORKERS = 2  # 同时执行的请求总数
+DEFAULT_QUEUE_SIZE = 8  # 排队中的请求上限
+DEFAULT_KIND_LIMITS = {KIND_CHAT: 2, KIND_VL: 1}
+# 为某类请求保留的工作线程数，其他类型的请求不能占用
+DEFAULT_RESERVED = {KIND_CHAT: 1}
+
+
+class RequestExecutor:
+    """有界、带优先级的AI请求线程池
+
+    submit()把请求放进队列，空闲的工作线程每次取出优先级最高、且该类型并发
+    未满的请求执行。reserved中的类型始终保留相应数量的线程（例如截图分析
+    占不满全部线程，用户聊天总能立即开始）。队列满时，新请求会挤掉排队中
+    优先级更低的最晚一个请求（被挤掉的Future会被取消）；没有可挤掉的请求时
+    拒绝提交、返回None，由调用方决定跳过还是报错。已取消但仍在执行的请求
+    可以用abandon()立即让出名额。
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 kind_limits=None, reserved=None):
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(1, queue_size)
+        self.kind_limits = dict(DEFAULT_KIND_LIMITS if kind_limits is None else kind_limits)
+        self.reserved = dict(DEFAULT_RESERVED if reserved is None else reserved)
+        self._cond = threading.Condition()
+        self._queue = []  # [(priority, 序号, kind, future, fn, args)]
+        self._running = {}  # kind -> 执行中的数量
+        self._active = {}  # 执行中的future -> kind（abandon后移除）
+        self._seq = 0
+        self._workers = 0
+        self._idle = 0
+        self._shutdown = False
+        self.rejected = 0  # 队列满被拒绝的请求数
+        self.preempted = 0  # 被更高优先级挤出队列的请求数
+
+    def submit(self, kind, fn, *args, priority=PRIORITY_BACKGROUND):
+        """提交请求，返回concurrent.futures.Future；队列已满且无法挤掉时返回None"""
+        future = Future()
+        victim = None
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("AI请求执行器已关闭")
+            self._purge_cancelled()
+            if len(self._queue) >= self.queue_size:
+                # 优先级最低、最晚提交的一个
+                lowest = max(self._queue)
+                if lowest[0] <= priority:
+                    self.rejected += 1
+                    return None
+                self._queue.remove(lowest)
+                self.preempted += 1
+                victim = lowest[3]
+            self._seq += 1
+            self._queue.append((priority, self._seq, kind, future, fn, args))
+            self._spawn_locked()
+            self._cond.notify_all()
+        if victim is not None:
+            victim.cancel()
+        return future
+
+    def abandon(self, future):
+        """放弃执行中的请求：立即释放它的类型名额和线程名额，结果不再关心
+
+        原线程执行完后直接退出；需要时另起一个线程接替。排队中的请求请用
+        future.cancel()。
+        """
+        with self._cond:
+            kind = self._active.pop(future, None)
+            if kind is None:
+                return False
+            self._running[kind] -= 1
+            self._workers -= 1
+            self._spawn_locked()
+            self._cond.notify_all()
+        return True
+
+    def pending(self, kind):
+        """该类型执行中和排队中的请求数"""
+        with self._cond:
+            self._purge_cancelled()
+            queued = sum(1 for entry in self._queue if entry[2] == kind)
+            return self._running.get(kind, 0) + queued
+
+    def shutdown(self):
+        """停止接收请求并取消所有排队中的请求（执行中的请求会继续完成）"""
+        with self._cond:
+            self._shutdown = True
+            queued, self._queue = self._queue, []
+            self._cond.notify_all()
+        for entry in queued:
+            entry[3].cancel()
+
+    def _spawn_locked(self):
+        if self._queue and self._idle == 0 and self._workers < self.max_workers:
+            self._workers += 1
+            threading.Thread(target=self._worker, name="ai-worker", daemon=True).start()
+
+    def _purge_cancelled(self):
+        self._queue = [entry for entry in self._queue if not entry[3].cancelled()]
+
+    def _can_run(self, kind):
+        """类型并发未满，且不会占用为其他类型保留的线程"""
+        running = self._running.get(kind, 0)
+        if running >= self.kind_limits.get(kind, self.max_workers):
+            return False
+        free = self.max_workers - sum(self._running.values())
+        held = sum(
+            max(0, count - self._running.get(other, 0))
+            for other, count in self.reserved.items()
+            if other != kind
+        )
+        # 至少留一个线程给任何类型，max_workers为1时保留不生效
+        return free > min(held, self.max_workers - 1)
+
+    def _next_runnable(self):
+        """优先级最高、且可以开始执行的排队请求"""
+        self._purge_cancelled()
+        runnable = [entry for entry in self._queue if self._can_run(entry[2])]
+        return min(runnable) if runnable else None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                entry = self._next_runnable()
+                while entry is None:
+                    if self._shutdown:
+                        self._workers -= 1
+                        return
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                    entry = self._next_runnable()
+                self._queue.remove(entry)
+                kind, future = entry[2], entry[3]
+                self._running[kind] = self._running.get(kind, 0) + 1
+                self._active[future] = kind
+
+            fn, args = entry[4], entry[5]
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._cond:
+                    if self._active.pop(future, None) is None:
+                        # 已被abandon：名额早已释放，本线程退出
+                        return
+                    self._running[kind] -= 1
+                    self._cond.notify_all()
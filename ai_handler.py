@@ -2,11 +2,55 @@
 import os
 import requests
 import json
+import threading
 from typing import Optional
 from datetime import datetime
+from urllib.parse import urlsplit
 import base64
 import io
 from PIL import ImageGrab
+from ai_executor import (
+    DEFAULT_KIND_LIMITS,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_RESERVED,
+    KIND_CHAT,
+    KIND_VL,
+)
+from response_cache import (
+    RESPONSE_CACHE_FILE,
+    RESPONSE_CACHE_MAX_TEMPERATURE,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    ResponseCache,
+)
+from request_cancel import CancellableHTTPAdapter, cancel_scope
+
+# HTTP连接池默认参数
+HTTP_POOL_SIZE = 4  # 每个接口保持的keep-alive连接数
+CONNECT_TIMEOUT = 5  # 建立连接超时（秒）
+CHAT_TIMEOUT = 30  # 聊天接口读取超时（秒）
+VL_TIMEOUT = 60  # 截图分析接口读取超时（秒）
+
+
+def endpoint_origin(url: str) -> str:
+    """接口的scheme://host:port部分，同一来源共用一个连接池"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def parse_sse_line(line: str):
+    """解析OpenAI兼容SSE流的一行，返回(是否结束, 内容片段或None)"""
+    if not line or not line.startswith("data:"):
+        return False, None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return True, None
+    choices = json.loads(data).get("choices") or []
+    delta = choices[0].get("delta", {}).get("content") if choices else None
+    return False, delta or None
+
+
 class ConfigManager:
     pass
 class AIChatHandler:
@@ -30,12 +74,79 @@ class AIChatHandler:
             config_manager = ConfigManager()
         self.config_manager = config_manager
 
+        # 每个接口来源一个带连接池的Session，复用TCP/TLS连接
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        if self._config_value("get_prewarm_connections", False):
+            threading.Thread(target=self.prewarm_connections, daemon=True).start()
+
+        # 可选的聊天回复缓存
+        self.response_cache = None
+        if self._config_value("get_response_cache", False):
+            self.response_cache = ResponseCache(
+                path=self._config_value("get_response_cache_file", RESPONSE_CACHE_FILE),
+                ttl=self._config_value("get_response_cache_ttl", RESPONSE_CACHE_TTL),
+                max_entries=self._config_value("get_response_cache_size", RESPONSE_CACHE_SIZE),
+                max_temperature=self._config_value(
+                    "get_response_cache_max_temperature", RESPONSE_CACHE_MAX_TEMPERATURE
+                ),
+            )
+
         # 尝试加载提示词
         self.system_prompt = self.load_prompt()
         
         # 尝试加载历史聊天记录
         self.load_conversation_history()
     
+    def _config_value(self, getter: str, default):
+        """从配置管理器读取参数，缺少对应方法时返回默认值"""
+        if self.config_manager and hasattr(self.config_manager, getter):
+            return getattr(self.config_manager, getter)()
+        return default
+
+    def get_session(self, url: str) -> requests.Session:
+        """获取url所在接口的共享Session（keep-alive连接池）"""
+        origin = endpoint_origin(url)
+        with self._sessions_lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                pool_size = self._config_value("get_http_pool_size", HTTP_POOL_SIZE)
+                adapter = CancellableHTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[origin] = session
+            return session
+
+    def request_timeout(self, read_getter: str, read_default):
+        """(连接超时, 读取超时)"""
+        return (
+            self._config_value("get_connect_timeout", CONNECT_TIMEOUT),
+            self._config_value(read_getter, read_default),
+        )
+
+    def prewarm_connections(self):
+        """预先建立到聊天和视觉接口的连接，首条消息不再等待握手"""
+        urls = [self._config_value("get_base_url", self.base_url)]
+        vl_api_url = self._config_value("get_vl_api_url", "")
+        if vl_api_url:
+            urls.append(vl_api_url)
+        for url in urls:
+            try:
+                # 任何响应都可以，只为把连接留在池中
+                self.get_session(url).head(
+                    endpoint_origin(url), timeout=self._config_value("get_connect_timeout", CONNECT_TIMEOUT)
+                )
+            except Exception as e:
+                print(f"预热连接失败 {endpoint_origin(url)}: {e}")
+
+    def close(self):
+        """关闭所有连接池"""
+        with self._sessions_lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
     def load_prompt(self) -> str:
         """从prompt.txt加载系统提示词"""
         default_prompt = """你是一个可爱的桌面宠物AI助手，你的名字叫"小星"。
@@ -141,7 +252,7 @@ class AIChatHandler:
                     vl_api_url = self.config_manager.get_vl_api_url()
                 
             # 调用支持视觉的DeepSeek API
-            response = requests.post(
+            response = self.get_session(vl_api_url).post(
                 vl_api_url,  # 注意：这里是硬编码的本地地址，可能与配置不符，建议后续优化
                 headers={
                     "Content-Type": "application/json",
@@ -154,7 +265,7 @@ class AIChatHandler:
                     "max_tokens": 300,
                     "stream": False
                 },
-                timeout=60
+                timeout=self.request_timeout("get_vl_timeout", VL_TIMEOUT)
             )
         
             if response.status_code == 200:
@@ -192,21 +303,8 @@ class AIChatHandler:
     
 
 
-    def chat(self, user_message: str, reset_conversation: bool = False) -> Optional[str]:
-        """
-        发送消息给AI并获取回复
-    
-        Args:
-            user_message: 用户消息
-            reset_conversation: 是否重置对话历史
-        
-        Returns:
-            AI的回复，如果失败返回None
-        """
-        if reset_conversation:
-            self.conversation_history = []
-    
-        # 准备消息历史
+    def build_chat_messages(self, user_message: str):
+        """系统提示 + 最近的聊天记录 + 当前用户消息"""
         messages = []
     
         # 添加系统提示
@@ -227,62 +325,117 @@ class AIChatHandler:
             "role": "user",
             "content": user_message
         })
+        return messages
+
+    def chat_payload(self, messages, stream: bool = False):
+        """从配置生成聊天请求体（同时刷新base_url）"""
+        # 从配置获取参数，提供默认值
+        temperature = 0.7  # 默认值
+        max_tokens = 500   # 默认值
+        model = "deepseek-chat"  # 默认模型
+        if hasattr(self, 'config_manager') and self.config_manager:
+            if hasattr(self.config_manager, 'get_temperature'):
+                temperature = self.config_manager.get_temperature()
+            if hasattr(self.config_manager, 'get_max_tokens'):
+                max_tokens = self.config_manager.get_max_tokens()
+            if hasattr(self.config_manager, 'get_model'):
+                model = self.config_manager.get_model()
+
+            if hasattr(self.config_manager, 'get_base_url'):
+                self.base_url = self.config_manager.get_base_url()
+
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+
+    def chat_headers(self):
+        """聊天接口的请求头"""
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    def post_chat(self, payload, stream: bool = False):
+        """向聊天接口发送请求"""
+        return self.get_session(self.base_url).post(
+            f"{self.base_url}/chat/completions",
+            headers=self.chat_headers(),
+            json=payload,
+            timeout=self.request_timeout("get_chat_timeout", CHAT_TIMEOUT),
+            stream=stream
+        )
+
+    def record_exchange(self, user_message: str, ai_reply: str):
+        """把一轮对话写入历史并保存"""
+        # 获取当前时间
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-        try:
-            # 从配置获取参数，提供默认值
-            temperature = 0.7  # 默认值
-            max_tokens = 500   # 默认值
-            model = "deepseek-chat"  # 默认模型
-            if hasattr(self, 'config_manager') and self.config_manager:
-                if hasattr(self.config_manager, 'get_temperature'):
-                    temperature = self.config_manager.get_temperature()
-                if hasattr(self.config_manager, 'get_max_tokens'):
-                    max_tokens = self.config_manager.get_max_tokens()
-                if hasattr(self.config_manager, 'get_model'):
-                    model = self.config_manager.get_model()
+        # 更新对话历史，包含时间戳
+        self.conversation_history.append({
+            "role": "user",
+            "content": user_message,
+            "timestamp": current_time
+        })
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": ai_reply,
+            "timestamp": current_time
+        })
+    
+        # 保存聊天历史到文件
+        self.save_conversation_history()
+
+    def cached_reply(self, payload) -> Optional[str]:
+        """回复缓存命中时返回缓存的回复"""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(payload)
 
-                if hasattr(self.config_manager, 'get_base_url'):
-                    self.base_url = self.config_manager.get_base_url()
+    def cache_reply(self, payload, ai_reply: str):
+        """把完整回复写入回复缓存"""
+        if self.response_cache is not None:
+            self.response_cache.put(payload, ai_reply)
 
+    def stream_enabled(self) -> bool:
+        """是否使用流式聊天"""
+        return bool(self._config_value("get_stream_chat", False))
+
+    def chat(self, user_message: str, reset_conversation: bool = False) -> Optional[str]:
+        """
+        发送消息给AI并获取回复
+    
+        Args:
+            user_message: 用户消息
+            reset_conversation: 是否重置对话历史
+        
+        Returns:
+            AI的回复，如果失败返回None
+        """
+        if reset_conversation:
+            self.conversation_history = []
+    
+        # 准备消息历史
+        messages = self.build_chat_messages(user_message)
+    
+        payload = self.chat_payload(messages)
+        cached = self.cached_reply(payload)
+        if cached:
+            self.record_exchange(user_message, cached)
+            return cached
+    
+        try:
             # 调用DeepSeek API
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                },
-                json={
-                    "model": model,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "stream": False
-                },
-                timeout=30
-            )
+            response = self.post_chat(payload)
         
             if response.status_code == 200:
                 result = response.json()
                 ai_reply = result["choices"][0]["message"]["content"]
-            
-                # 获取当前时间
-                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-                # 更新对话历史，包含时间戳
-                self.conversation_history.append({
-                    "role": "user",
-                    "content": user_message,
-                    "timestamp": current_time
-                })
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": ai_reply,
-                    "timestamp": current_time
-                })
-            
-                # 保存聊天历史到文件
-                self.save_conversation_history()
-            
+                self.cache_reply(payload, ai_reply)
+                self.record_exchange(user_message, ai_reply)
                 return ai_reply
             else:
                 print(f"API请求失败: {response.status_code} - {response.text}")
@@ -294,6 +447,72 @@ class AIChatHandler:
         except Exception as e:
             print(f"聊天请求出错: {e}")
             return None
+
+    def chat_stream(self, user_message: str, on_delta, reset_conversation: bool = False,
+                    stream: bool = True, cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """
+        流式发送消息，每收到一段回复就调用on_delta(text)
+    
+        解析OpenAI兼容的SSE流（data: {...} / data: [DONE]）；接口不支持流式、
+        直接返回JSON时按一次性回复处理。完整回复收到后才写入历史。
+        cancel_event被设置后尽快中止读取，不回调也不写历史；传入RequestCancel时
+        取消会直接关闭连接，不必等服务器回复。
+        
+        Returns:
+            完整的AI回复，如果失败或被取消返回None
+        """
+        if reset_conversation:
+            self.conversation_history = []
+    
+        messages = self.build_chat_messages(user_message)
+        payload = self.chat_payload(messages, stream=stream)
+        cached = self.cached_reply(payload)
+        if cached:
+            on_delta(cached)
+            self.record_exchange(user_message, cached)
+            return cached
+        parts = []
+    
+        try:
+            with cancel_scope(cancel_event), self.post_chat(payload, stream=True) as response:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if response.status_code != 200:
+                    print(f"API请求失败: {response.status_code} - {response.text}")
+                    return None
+            
+                if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                    ai_reply = response.json()["choices"][0]["message"]["content"]
+                    on_delta(ai_reply)
+                    parts.append(ai_reply)
+                else:
+                    # SSE规定使用UTF-8；Content-Type没有charset时requests会按ISO-8859-1解码
+                    response.encoding = "utf-8"
+                    for line in response.iter_lines(decode_unicode=True):
+                        if cancel_event is not None and cancel_event.is_set():
+                            return None
+                        done, delta = parse_sse_line(line)
+                        if done:
+                            break
+                        if delta:
+                            parts.append(delta)
+                            on_delta(delta)
+        
+            ai_reply = "".join(parts)
+            if not ai_reply:
+                return None
+            self.cache_reply(payload, ai_reply)
+            self.record_exchange(user_message, ai_reply)
+            return ai_reply
+            
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                return None  # 连接被取消关闭，不算出错
+            if isinstance(e, requests.exceptions.Timeout):
+                print("API请求超时")
+                return "".join(parts) or "抱歉，我好像卡住了... (╥﹏╥) 请稍后再试吧~"
+            print(f"流式聊天请求出错: {e}")
+            return None
     
     def get_recent_history(self, count: int = 10):
         """获取最近的聊天历史，用于发送给API"""
@@ -411,7 +630,23 @@ class ConfigManager:
             "model": "qwen3-omni-flash-2025-12-01",  # 新增：模型名称
             "vl_model":"openbmb/minicpm-v4.5:8b",
             "vl_api_key": "",
-            "vl_api_url": ""
+            "vl_api_url": "",
+            "http_pool_size": HTTP_POOL_SIZE,  # 每个接口的keep-alive连接数
+            "connect_timeout": CONNECT_TIMEOUT,
+            "chat_timeout": CHAT_TIMEOUT,
+            "vl_timeout": VL_TIMEOUT,
+            "prewarm_connections": False,  # 启动时预先建立连接
+            "stream_chat": True,  # 流式显示聊天回复
+            "ai_max_workers": DEFAULT_MAX_WORKERS,  # 同时执行的AI请求数
+            "ai_queue_size": DEFAULT_QUEUE_SIZE,  # 排队中的AI请求上限
+            "chat_concurrency": DEFAULT_KIND_LIMITS[KIND_CHAT],  # 同时进行的聊天请求数
+            "vl_concurrency": DEFAULT_KIND_LIMITS[KIND_VL],  # 同时进行的截图分析数
+            "chat_reserved_workers": DEFAULT_RESERVED[KIND_CHAT],  # 只给聊天用的线程数
+            "response_cache": False,  # 缓存相同请求的聊天回复
+            "response_cache_file": RESPONSE_CACHE_FILE,
+            "response_cache_ttl": RESPONSE_CACHE_TTL,  # 缓存有效期（秒）
+            "response_cache_size": RESPONSE_CACHE_SIZE,  # 最多缓存的回复条数
+            "response_cache_max_temperature": RESPONSE_CACHE_MAX_TEMPERATURE  # 温度高于此值不走缓存
         }
         
         try:
@@ -574,4 +809,69 @@ class ConfigManager:
         self.config["vl_api_url"] = url
         return self.save_config()
 
+    def get_http_pool_size(self):
+        """获取每个接口的连接池大小"""
+        return self.config.get("http_pool_size", HTTP_POOL_SIZE)
+
+    def get_connect_timeout(self):
+        """获取连接超时（秒）"""
+        return self.config.get("connect_timeout", CONNECT_TIMEOUT)
+
+    def get_chat_timeout(self):
+        """获取聊天接口读取超时（秒）"""
+        return self.config.get("chat_timeout", CHAT_TIMEOUT)
+
+    def get_vl_timeout(self):
+        """获取截图分析接口读取超时（秒）"""
+        return self.config.get("vl_timeout", VL_TIMEOUT)
+
+    def get_prewarm_connections(self):
+        """获取是否在启动时预热连接"""
+        return self.config.get("prewarm_connections", False)
+
+    def get_stream_chat(self):
+        """获取是否流式显示聊天回复"""
+        return self.config.get("stream_chat", True)
+
+    def get_ai_max_workers(self):
+        """获取同时执行的AI请求数"""
+        return self.config.get("ai_max_workers", DEFAULT_MAX_WORKERS)
+
+    def get_ai_queue_size(self):
+        """获取排队中的AI请求上限"""
+        return self.config.get("ai_queue_size", DEFAULT_QUEUE_SIZE)
+
+    def get_response_cache(self):
+        """获取是否启用聊天回复缓存"""
+        return self.config.get("response_cache", False)
+
+    def get_response_cache_file(self):
+        """获取回复缓存文件路径"""
+        return self.config.get("response_cache_file", RESPONSE_CACHE_FILE)
+
+    def get_response_cache_ttl(self):
+        """获取回复缓存有效期（秒）"""
+        return self.config.get("response_cache_ttl", RESPONSE_CACHE_TTL)
+
+    def get_response_cache_size(self):
+        """获取最多缓存的回复条数"""
+        return self.config.get("response_cache_size", RESPONSE_CACHE_SIZE)
+
+    def get_response_cache_max_temperature(self):
+        """获取走缓存的最高温度"""
+        return self.config.get("response_cache_max_temperature", RESPONSE_CACHE_MAX_TEMPERATURE)
+
+    def get_kind_limits(self):
+        """获取各类AI请求的并发上限"""
+        return {
+            KIND_CHAT: self.config.get("chat_concurrency", DEFAULT_KIND_LIMITS[KIND_CHAT]),
+            KIND_VL: self.config.get("vl_concurrency", DEFAULT_KIND_LIMITS[KIND_VL]),
+        }
+
+    def get_reserved_workers(self):
+        """获取为各类AI请求保留的线程数"""
+        return {
+            KIND_CHAT: self.config.get("chat_reserved_workers", DEFAULT_RESERVED[KIND_CHAT]),
+        }
+
     
\ No newline at end of file
@@ -0,0 +1,259 @@
+﻿"""帧加载基准测试（不需要显示器）
+
+对gifs目录中的每个动画和SCALE_OPTIONS中的每个缩放，测量解码、缩放、翻转、
+读缓存耗时、帧数和峰值RSS；另外按缩放测量整套动画（load_gifs）的冷/热加载耗时。
+每个测量项在独立子进程中运行，峰值RSS互不影响。结果输出为JSON，便于帧管线
+改动后对比回归。有显示器时额外测量ImageTk.PhotoImage包装耗时。
+
+用法:
+    python benchmark.py                       # 全部动画 × 全部缩放，JSON打印到stdout
+    python benchmark.py -o bench.json         # 结果写入文件
+    python benchmark.py --scales 0.9 1.9 --animations move idle1
+    python benchmark.py --baseline bench.json # 与旧结果对比，超出容差时返回1
+    python benchmark.py --motion-steps 0      # 跳过运动引擎测量
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import PIL
+from PIL import Image
+
+import frame_loader
+import motion_engine
+from frame_loader import (
+    DEFAULT_RESAMPLE,
+    atlas_path,
+    pil_frames_bytes,
+    read_atlas,
+    read_frame_cache,
+    read_gif_source_frames,
+    scale_frames,
+    write_frame_cache,
+)
+
+ANIMATIONS = ["move", "idle1", "idle2", "idle3", "idle4", "drag"]
+TIMING_FIELDS = ["decode_ms", "resize_ms", "flip_ms", "cache_read_ms", "photoimage_ms"]
+LOAD_GIFS_FIELDS = ["cold_ms", "cached_ms"]
+MOTION_FIELDS = ["step_us"]
+# 对比时忽略小于该值的绝对差异，避免毫秒级抖动被当成回归
+MIN_REGRESSION_MS = 1.0
+
+
+def peak_rss_bytes():
+    """当前进程的峰值常驻内存（字节），无法获取时返回None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None
+
+
+def timed(func, repeat):
+    """运行repeat次，返回(最后一次结果, 耗时中位数ms)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(durations), 3)
+
+
+def measure_photoimage(pil_frames, repeat):
+    """有显示器时测量PhotoImage包装耗时，否则返回None"""
+    try:
+        import tkinter as tk
+        from PIL import ImageTk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception:
+        return None
+    try:
+        _, ms = timed(lambda: [ImageTk.PhotoImage(img) for img in pil_frames], repeat)
+        return ms
+    finally:
+        root.destroy()
+
+
+def bench_animation(gif_path, scale, repeat):
+    """子进程：测量单个动画在某个缩放下的各阶段耗时"""
+    def decode():
+        source = read_atlas(atlas_path(gif_path))
+        return source if source is not None else read_gif_source_frames(gif_path)
+
+    (frames, delays), decode_ms = timed(decode, repeat)
+    resized, resize_ms = timed(lambda: scale_frames(frames, scale, DEFAULT_RESAMPLE), repeat)
+    _, flip_ms = timed(
+        lambda: [img.transpose(Image.Transpose.FLIP_LEFT_RIGHT) for img in resized], repeat
+    )
+
+    with tempfile.TemporaryDirectory(prefix="ameath_bench_") as cache_dir:
+        frame_loader.FRAME_CACHE_DIR = cache_dir
+        write_frame_cache(gif_path, scale, resized, delays)
+        _, cache_read_ms = timed(lambda: read_frame_cache(gif_path, scale), repeat)
+
+    return {
+        "animation": os.path.splitext(os.path.basename(gif_path))[0],
+        "scale": scale,
+        "frames": len(resized),
+        "decode_ms": decode_ms,
+        "resize_ms": resize_ms,
+        "flip_ms": flip_ms,
+        "cache_read_ms": cache_read_ms,
+        "photoimage_ms": measure_photoimage(resized, repeat),
+        "frame_bytes": pil_frames_bytes(resized),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def bench_load_gifs(scale, idle_paths):
+    """子进程：测量整套动画（move + 全部idle）的冷加载与缓存命中耗时"""
+    from pet_window import decode_frame_set
+
+    with tempfile.TemporaryDirectory(prefix="ameath_bench_") as cache_dir:
+        frame_loader.FRAME_CACHE_DIR = cache_dir
+        _, cold_ms = timed(lambda: decode_frame_set(scale, idle_paths), 1)
+        _, cached_ms = timed(lambda: decode_frame_set(scale, idle_paths), 1)
+    return {
+        "scale": scale,
+        "cold_ms": cold_ms,
+        "cached_ms": cached_ms,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def bench_motion(count, seed=0):
+    """子进程：无显示器推进运动引擎count步，测量单步耗时"""
+    state = motion_engine.MotionState(200, 200, 180, 180, 1920, 1080, rng=random.Random(seed))
+    start = time.perf_counter()
+    events = motion_engine.simulate(state, count, seed=seed)
+    elapsed = time.perf_counter() - start
+    return {
+        "steps": count,
+        "step_us": round(elapsed / count * 1e6, 3),
+        "steps_per_s": round(count / elapsed),
+        "events": events,
+    }
+
+
+def run(animations, scales, repeat, gif_dir, motion_steps=0):
+    """在一次一任务的子进程池中运行全部测量"""
+    gif_paths = {name: os.path.join(gif_dir, f"{name}.gif") for name in animations}
+    idle_paths = [os.path.join(gif_dir, f"idle{i}.gif") for i in range(1, 5)]
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "animations": [],
+        "load_gifs": [],
+        "motion": None,
+    }
+    with multiprocessing.Pool(processes=1, maxtasksperchild=1) as pool:
+        for scale in scales:
+            for name, gif_path in gif_paths.items():
+                record = pool.apply(bench_animation, (gif_path, scale, repeat))
+                results["animations"].append(record)
+                print(
+                    f"{name:>6} {scale}x: {record['frames']}帧 解码{record['decode_ms']}ms "
+                    f"缩放{record['resize_ms']}ms", file=sys.stderr
+                )
+            record = pool.apply(bench_load_gifs, (scale, idle_paths))
+            results["load_gifs"].append(record)
+            print(f"load_gifs {scale}x: 冷{record['cold_ms']}ms 热{record['cached_ms']}ms",
+                  file=sys.stderr)
+        if motion_steps > 0:
+            record = pool.apply(bench_motion, (motion_steps,))
+            results["motion"] = record
+            print(f"motion: {record['steps_per_s']}步/秒", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基线对比，返回回归描述列表"""
+    regressions = []
+
+    def check(label, fields, new, old):
+        for field in fields + ["peak_rss_bytes"]:
+            new_value, old_value = new.get(field), old.get(field)
+            if new_value is None or old_value is None:
+                continue
+            if new_value <= old_value * (1 + tolerance):
+                continue
+            if field.endswith("_ms") and new_value - old_value < MIN_REGRESSION_MS:
+                continue
+            regressions.append(f"{label} {field}: {old_value} -> {new_value}")
+
+    old_animations = {(r["animation"], r["scale"]): r for r in baseline.get("animations", [])}
+    for record in results["animations"]:
+        old = old_animations.get((record["animation"], record["scale"]))
+        if old:
+            check(f"{record['animation']} {record['scale']}x", TIMING_FIELDS, record, old)
+
+    old_load = {r["scale"]: r for r in baseline.get("load_gifs", [])}
+    for record in results["load_gifs"]:
+        old = old_load.get(record["scale"])
+        if old:
+            check(f"load_gifs {record['scale']}x", LOAD_GIFS_FIELDS, record, old)
+
+    if results.get("motion") and baseline.get("motion"):
+        check("motion", MOTION_FIELDS, results["motion"], baseline["motion"])
+    return regressions
+
+
+def main(argv=None):
+    from pet_window import SCALE_OPTIONS, GIF_DIR
+
+    parser = argparse.ArgumentParser(description="帧加载基准测试")
+    parser.add_argument("--scales", type=float, nargs="+", default=SCALE_OPTIONS)
+    parser.add_argument("--animations", nargs="+", default=ANIMATIONS)
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取中位数）")
+    parser.add_argument("-o", "--output", help="JSON结果输出文件（默认stdout）")
+    parser.add_argument("--baseline", help="用于对比回归的旧结果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的相对变慢比例")
+    parser.add_argument("--motion-steps", type=int, default=200000, help="运动引擎测量步数")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # resource_path以当前目录为基准
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    results = run(args.animations, args.scales, max(1, args.repeat), GIF_DIR, args.motion_steps)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"回归: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
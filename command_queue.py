@@ -0,0 +1,48 @@
+﻿"""跨线程命令队列：托盘等后台线程投递命令，由Tk线程统一执行"""
+import queue
+
+# 唤醒Tk线程的虚拟事件
+COMMAND_EVENT = "<<AppCommand>>"
+
+
+class CommandQueue:
+    """后台线程调用post()投递命令，并用虚拟事件唤醒Tk主循环
+
+    命令只在Tk线程的事件回调中执行，不需要轮询。一次唤醒会执行队列中所有
+    已投递的命令，多个post合并处理也没有问题。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        root.bind(COMMAND_EVENT, self._drain)
+
+    def post(self, func, *args):
+        """投递命令（任意线程可调用），队列已关闭时返回False"""
+        if self._closed:
+            return False
+        self._queue.put((func, args))
+        try:
+            # event_generate是Tk中少数可以从其他线程安全调用的操作
+            self.root.event_generate(COMMAND_EVENT, when="tail")
+        except Exception as e:
+            print(f"唤醒主线程失败: {e}")
+            return False
+        return True
+
+    def close(self):
+        """关闭队列，之后的post被忽略"""
+        self._closed = True
+
+    def _drain(self, event=None):
+        """在Tk线程中执行所有待处理命令"""
+        while not self._closed:
+            try:
+                func, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"执行命令失败: {e}")
@@ -0,0 +1,35 @@
+﻿"""把GIF编译为sprite atlas（预合成RGBA图集 + 帧/延迟索引）
+
+用法: python compile_atlas.py [GIF目录或GIF文件...]
+不带参数时编译gifs目录下的全部GIF。存在atlas时宠物会优先加载它。
+"""
+import glob
+import os
+import sys
+
+from frame_loader import compile_atlas
+
+
+def main(args):
+    targets = args or ["gifs"]
+    gif_paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            gif_paths.extend(sorted(glob.glob(os.path.join(target, "*.gif"))))
+        else:
+            gif_paths.append(target)
+
+    failed = 0
+    for gif_path in gif_paths:
+        try:
+            output_path = compile_atlas(gif_path)
+            size_kb = os.path.getsize(output_path) / 1024
+            print(f"{gif_path} -> {output_path} ({size_kb:.0f}KB)")
+        except Exception as e:
+            print(f"编译失败 {gif_path}: {e}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
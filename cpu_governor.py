@@ -0,0 +1,55 @@
+﻿"""CPU预算调节器：根据本进程CPU占用自动拉长各周期任务的间隔"""
+import time
+
+# 节流档位：周期任务间隔的放大倍数，0档为全速
+THROTTLE_LEVELS = [1.0, 1.5, 2.0, 3.0, 4.0]
+# 降档后的预计占用低于预算的该比例时才恢复，避免在两档之间来回跳
+HEADROOM_RATIO = 0.8
+DEFAULT_CPU_BUDGET = 5.0  # 百分比（单核）
+
+
+class CpuGovernor:
+    """每次update()计算两次调用之间的CPU占用率并调整节流档位
+
+    占用率 = 进程CPU时间增量 / 墙钟时间增量（100%表示占满一个核）。超出预算时
+    升一档；降一档后的预计占用仍有余量时降一档，直到恢复全速。
+    """
+
+    def __init__(self, budget_percent=DEFAULT_CPU_BUDGET, levels=THROTTLE_LEVELS,
+                 clock=time.monotonic, cpu_clock=time.process_time):
+        self.budget = budget_percent
+        self.levels = levels
+        self.clock = clock
+        self.cpu_clock = cpu_clock
+        self.level = 0
+        self.usage = None  # 最近一次测得的CPU占用率(%)
+        self._last = None
+
+    @property
+    def scale(self):
+        """当前档位的间隔放大倍数"""
+        return self.levels[self.level]
+
+    def update(self):
+        """测量占用率、调整档位，返回新的放大倍数"""
+        now, cpu = self.clock(), self.cpu_clock()
+        last, self._last = self._last, (now, cpu)
+        if last is None or now <= last[0]:
+            return self.scale
+        self.usage = (cpu - last[1]) / (now - last[0]) * 100
+
+        if self.usage > self.budget:
+            self.level = min(self.level + 1, len(self.levels) - 1)
+        elif self.level > 0:
+            # 间隔缩短后CPU占用大致按倍数比例上升
+            predicted = self.usage * self.levels[self.level] / self.levels[self.level - 1]
+            if predicted < self.budget * HEADROOM_RATIO:
+                self.level -= 1
+        return self.scale
+
+    def report(self):
+        """托盘菜单显示用的一行摘要"""
+        if self.usage is None:
+            return f"CPU: 统计中（预算{self.budget:g}%）"
+        throttle = "全速" if self.level == 0 else f"节流{self.scale:g}x"
+        return f"CPU: {self.usage:.1f}% / 预算{self.budget:g}% · {throttle}"
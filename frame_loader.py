@@ -0,0 +1,482 @@
+﻿"""GIF帧解码、sprite atlas与磁盘缓存（纯PIL，不依赖Tk）"""
+from PIL import Image
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import threading
+import hashlib
+import mmap
+import struct
+import zlib
+import os
+
+# 帧缓存配置
+FRAME_CACHE_DIR = os.path.join(
+    os.environ.get("APPDATA", os.path.expanduser("~")), "ameath_cache", "frames"
+)
+FRAME_CACHE_MAGIC = b"AMFC"
+FRAME_CACHE_VERSION = 2
+# 头部: magic, 版本, 来源（GIF或atlas）修改时间(ns), 缩放, 帧数, 宽, 高
+FRAME_CACHE_HEADER = struct.Struct("<4sHqdIII")
+
+# 重采样配置
+DEFAULT_RESAMPLE = Image.Resampling.LANCZOS
+RESAMPLE_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "box": Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "hamming": Image.Resampling.HAMMING,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+# 预览档缩小时先用Image.reduce按整数倍降采样，再用廉价滤镜做剩余部分
+PREVIEW_REDUCING_GAP = 2.0
+
+# sprite atlas配置：与GIF同名的.atlas文件，单列图集，每帧在文件中连续存放
+ATLAS_EXT = ".atlas"
+ATLAS_MAGIC = b"AMAT"
+ATLAS_VERSION = 1
+# 头部: magic, 版本, 帧宽, 帧高, 帧数
+ATLAS_HEADER = struct.Struct("<4sHIII")
+
+
+def read_gif_source_frames(gif_path, collapse_duplicates=True):
+    """解码GIF为合成完毕的原尺寸RGBA帧，返回(frames, delays)
+
+    collapse_duplicates为True时，与上一帧像素完全相同的帧会被合并到上一帧
+    （延迟相加），既不重复缩放，也减少播放时的label.config调用。
+    """
+    frames = []
+    delays = []
+    gif = Image.open(gif_path)
+    prev_bytes = None
+    removed = 0
+    for i in itertools.count():
+        try:
+            gif.seek(i)
+            frame = gif.convert("RGBA")
+            duration = gif.info.get("duration", 80)
+            if collapse_duplicates:
+                frame_bytes = frame.tobytes()
+                if frame_bytes == prev_bytes:
+                    delays[-1] += duration
+                    removed += 1
+                    continue
+                prev_bytes = frame_bytes
+            frames.append(frame)
+            delays.append(duration)
+        except EOFError:
+            break
+    if removed:
+        print(f"{os.path.basename(gif_path)}: 合并了{removed}个重复帧")
+    return frames, delays
+
+
+def resample_filter(name, default=DEFAULT_RESAMPLE):
+    """把配置中的滤镜名（如"bilinear"）转换为Pillow常量"""
+    resample = RESAMPLE_FILTERS.get(str(name).lower())
+    if resample is None:
+        print(f"未知的重采样滤镜: {name}，使用默认值")
+        return default
+    return resample
+
+
+def scale_frames(frames, scale, resample=DEFAULT_RESAMPLE, reducing_gap=None):
+    """按倍数缩放帧（默认LANCZOS）"""
+    resized = []
+    for frame in frames:
+        w, h = frame.size
+        new_w, new_h = int(w * scale), int(h * scale)
+        # 确保缩放后尺寸有效
+        if new_w <= 0 or new_h <= 0:
+            new_w = max(1, new_w)
+            new_h = max(1, new_h)
+        resized.append(
+            frame.resize((new_w, new_h), resample, reducing_gap=reducing_gap)
+        )
+    return resized
+
+
+def decode_gif_frames(gif_path, scale=1.0, collapse_duplicates=True,
+                      resample=DEFAULT_RESAMPLE, reducing_gap=None):
+    """解码并缩放GIF，返回(pil_frames, delays)；存在不旧于GIF的sprite atlas时改从atlas读取"""
+    source = read_atlas(atlas_path(gif_path)) if atlas_current(gif_path) else None
+    if source is None:
+        source = read_gif_source_frames(gif_path, collapse_duplicates)
+    frames, delays = source
+    return scale_frames(frames, scale, resample, reducing_gap), delays
+
+
+def atlas_path(gif_path):
+    """GIF对应的sprite atlas路径"""
+    return os.path.splitext(gif_path)[0] + ATLAS_EXT
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def atlas_current(gif_path):
+    """atlas存在且不比GIF旧（GIF被编辑过后atlas作废，改读GIF）"""
+    atlas_mtime = _mtime_ns(atlas_path(gif_path))
+    if atlas_mtime is None:
+        return False
+    gif_mtime = _mtime_ns(gif_path)
+    return gif_mtime is None or atlas_mtime >= gif_mtime
+
+
+def source_mtime(gif_path):
+    """帧来源的修改时间：GIF和atlas中较新的那个，任一被修改都会使缓存失效"""
+    mtimes = [m for m in (_mtime_ns(gif_path), _mtime_ns(atlas_path(gif_path))) if m is not None]
+    if not mtimes:
+        raise FileNotFoundError(gif_path)
+    return max(mtimes)
+
+
+def compile_atlas(gif_path, output_path=None):
+    """把GIF编译为sprite atlas：预合成的单列RGBA图集 + 帧/延迟索引
+
+    返回写入的atlas路径。
+    """
+    frames, delays = read_gif_source_frames(gif_path)
+    if not frames:
+        raise ValueError(f"GIF中没有可用帧: {gif_path}")
+    w, h = frames[0].size
+    sheet = Image.new("RGBA", (w, h * len(frames)))
+    for i, frame in enumerate(frames):
+        sheet.paste(frame, (0, i * h))
+
+    output_path = output_path or atlas_path(gif_path)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, w, h, len(frames)))
+        f.write(struct.pack(f"<{len(delays)}I", *(int(d) for d in delays)))
+        f.write(sheet.tobytes())
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def read_atlas(path):
+    """内存映射读取sprite atlas，返回(frames, delays)；不存在或格式不符返回None
+
+    返回的帧直接引用映射内存，不复制像素；帧全部释放后映射随之关闭。
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, w, h, count = ATLAS_HEADER.unpack_from(mapped, 0)
+        if magic != ATLAS_MAGIC or version != ATLAS_VERSION or count == 0:
+            return None
+        delays = list(struct.unpack_from(f"<{count}I", mapped, ATLAS_HEADER.size))
+    except struct.error:
+        return None
+
+    offset = ATLAS_HEADER.size + 4 * count
+    frame_size = w * h * 4
+    if len(mapped) < offset + frame_size * count:
+        return None
+    view = memoryview(mapped)
+    frames = [
+        Image.frombuffer(
+            "RGBA", (w, h), view[offset + i * frame_size:offset + (i + 1) * frame_size],
+            "raw", "RGBA", 0, 1
+        )
+        for i in range(count)
+    ]
+    return frames, delays
+
+
+def pil_frames_bytes(pil_frames):
+    """估算一组PIL帧占用的像素内存（字节）"""
+    return sum(img.width * img.height * len(img.getbands()) for img in pil_frames)
+
+
+def frame_cache_path(gif_path, scale, resample=DEFAULT_RESAMPLE):
+    """缓存文件路径（每个GIF+缩放+滤镜一个文件，GIF变化时原地覆盖）"""
+    key = f"{os.path.abspath(gif_path)}|{scale:.3f}|{int(resample)}".encode("utf-8")
+    name = hashlib.sha1(key).hexdigest()[:16]
+    return os.path.join(FRAME_CACHE_DIR, f"{name}.frames")
+
+
+def read_frame_cache(gif_path, scale, resample=DEFAULT_RESAMPLE):
+    """读取缓存的已缩放帧，未命中或已过期返回None"""
+    try:
+        mtime = source_mtime(gif_path)
+        with open(frame_cache_path(gif_path, scale, resample), "rb") as f:
+            header = f.read(FRAME_CACHE_HEADER.size)
+            magic, version, cached_mtime, cached_scale, count, w, h = (
+                FRAME_CACHE_HEADER.unpack(header)
+            )
+            if (
+                magic != FRAME_CACHE_MAGIC
+                or version != FRAME_CACHE_VERSION
+                or cached_mtime != mtime
+                or abs(cached_scale - scale) > 1e-6
+                or count == 0
+            ):
+                return None
+            delays = list(struct.unpack(f"<{count}I", f.read(4 * count)))
+            raw = zlib.decompress(f.read())
+    except (OSError, struct.error, zlib.error):
+        return None
+
+    pil_frames = frames_from_buffer((w, h), count, raw)
+    if pil_frames is None:
+        return None
+    return pil_frames, delays
+
+
+def frames_from_buffer(size, count, raw):
+    """把count帧拼接在一起的RGBA字节还原为PIL帧（共享同一块内存，不复制）"""
+    w, h = size
+    frame_size = w * h * 4
+    if len(raw) != frame_size * count:
+        return None
+    view = memoryview(raw)
+    return [
+        Image.frombuffer(
+            "RGBA", (w, h), view[i * frame_size:(i + 1) * frame_size], "raw", "RGBA", 0, 1
+        )
+        for i in range(count)
+    ]
+
+
+def frame_cache_valid(gif_path, scale, resample=DEFAULT_RESAMPLE):
+    """只读头部，判断缓存是否存在且未过期"""
+    try:
+        mtime = source_mtime(gif_path)
+        with open(frame_cache_path(gif_path, scale, resample), "rb") as f:
+            magic, version, cached_mtime, cached_scale, count, _, _ = (
+                FRAME_CACHE_HEADER.unpack(f.read(FRAME_CACHE_HEADER.size))
+            )
+    except (OSError, struct.error):
+        return False
+    return (
+        magic == FRAME_CACHE_MAGIC
+        and version == FRAME_CACHE_VERSION
+        and cached_mtime == mtime
+        and abs(cached_scale - scale) <= 1e-6
+        and count > 0
+    )
+
+
+def write_frame_cache(gif_path, scale, pil_frames, delays, resample=DEFAULT_RESAMPLE):
+    """将已缩放帧写入缓存（先写临时文件再替换，避免读到半个文件）"""
+    if not pil_frames:
+        return False
+    w, h = pil_frames[0].size
+    if any(img.size != (w, h) for img in pil_frames):
+        return False
+    try:
+        mtime = source_mtime(gif_path)
+        path = frame_cache_path(gif_path, scale, resample)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = zlib.compress(b"".join(img.tobytes() for img in pil_frames), 1)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(FRAME_CACHE_HEADER.pack(
+                FRAME_CACHE_MAGIC, FRAME_CACHE_VERSION, mtime, scale, len(pil_frames), w, h
+            ))
+            f.write(struct.pack(f"<{len(delays)}I", *(int(d) for d in delays)))
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"写入帧缓存失败: {e}")
+        return False
+
+
+def _decode_to_buffer(gif_path, scale, resample):
+    """进程池任务：解码+缩放（顺带写入磁盘缓存），返回(size, delays, raw)"""
+    pil_frames, delays = load_scaled_frames(gif_path, scale, resample=resample)
+    size = pil_frames[0].size
+    return size, delays, b"".join(img.tobytes() for img in pil_frames)
+
+
+def load_scaled_frames_parallel(gif_paths, scale=1.0, max_workers=None,
+                                resample=DEFAULT_RESAMPLE):
+    """用进程池并行解码多个GIF，返回{gif_path: (pil_frames, delays)}
+
+    已有有效磁盘缓存的GIF直接在当前进程读取，只有未命中的才交给子进程，
+    全部命中或只有一个未命中时不会启动进程池。子进程只返回原始RGBA字节，
+    调用方拿到的PIL帧可直接用于ImageTk.PhotoImage。
+    """
+    results = {}
+    pending = []
+    for gif_path in gif_paths:
+        cached = read_frame_cache(gif_path, scale, resample)
+        if cached is not None:
+            results[gif_path] = cached
+        else:
+            pending.append(gif_path)
+    if not pending:
+        return results
+    if len(pending) == 1:
+        # 单个GIF直接在当前进程解码，省去启动进程池和回传字节的开销
+        results[pending[0]] = load_scaled_frames(pending[0], scale, resample=resample)
+        return results
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(pending)))
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                gif_path: pool.submit(_decode_to_buffer, gif_path, scale, resample)
+                for gif_path in pending
+            }
+            for gif_path, future in futures.items():
+                size, delays, raw = future.result()
+                pil_frames = frames_from_buffer(size, len(delays), raw)
+                if pil_frames is not None:
+                    results[gif_path] = (pil_frames, delays)
+    except Exception as e:
+        print(f"并行解码GIF失败，改为逐个解码: {e}")
+
+    # 子进程失败或结果异常的GIF在当前进程补齐
+    for gif_path in pending:
+        if gif_path not in results:
+            results[gif_path] = load_scaled_frames(gif_path, scale, resample=resample)
+    return results
+
+
+def load_scaled_frames(gif_path, scale=1.0, use_cache=True,
+                       resample=DEFAULT_RESAMPLE, preview=False):
+    """加载已缩放帧：优先读磁盘缓存，未命中时解码并回写缓存
+
+    preview为True时是快速预览档：先用Image.reduce降采样再用resample收尾，
+    结果只用于临时显示，不读写缓存。
+    """
+    if preview:
+        return decode_gif_frames(
+            gif_path, scale, resample=resample, reducing_gap=PREVIEW_REDUCING_GAP
+        )
+    if use_cache:
+        cached = read_frame_cache(gif_path, scale, resample)
+        if cached is not None:
+            return cached
+    pil_frames, delays = decode_gif_frames(gif_path, scale, resample=resample)
+    if use_cache:
+        write_frame_cache(gif_path, scale, pil_frames, delays, resample)
+    return pil_frames, delays
+
+
+class FrameLRU:
+    """有界LRU：保存已解码的帧集合，超出容量时淘汰最久未使用的（线程安全）
+
+    托盘线程会读取快照统计内存，所有访问都在锁内进行；loader()在锁外调用。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, key, value):
+        """放入帧集合（已存在则覆盖）"""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def get(self, key, loader):
+        """取出key对应的帧集合，不存在时调用loader()加载"""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def keys(self):
+        """按最久未使用到最近使用的顺序返回key列表"""
+        with self._lock:
+            return list(self._items)
+
+    def items(self):
+        """返回(key, value)快照，不改变使用顺序"""
+        with self._lock:
+            return list(self._items.items())
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+class ScalePyramid:
+    """多缩放帧缓存：在内存预算内保留当前缩放及相邻缩放的帧集合（线程安全）"""
+
+    def __init__(self, budget_bytes, size_of):
+        self.budget_bytes = budget_bytes
+        self.size_of = size_of
+        self.center = None
+        self._items = {}  # scale -> (frame_set, nbytes)
+        self._lock = threading.Lock()
+
+    def set_center(self, scale):
+        """设置当前缩放，超出预算时优先淘汰离它最远的缩放"""
+        with self._lock:
+            self.center = scale
+            self._evict_locked()
+
+    def put(self, scale, frame_set):
+        """放入一个缩放的帧集合，放不下时返回False"""
+        nbytes = self.size_of(frame_set)
+        with self._lock:
+            self._items[scale] = (frame_set, nbytes)
+            self._evict_locked()
+            return scale in self._items
+
+    def get(self, scale):
+        """取出缩放对应的帧集合，未缓存返回None"""
+        with self._lock:
+            item = self._items.get(scale)
+        return item[0] if item else None
+
+    def total_bytes(self):
+        """已缓存帧的总内存"""
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._items.values())
+
+    def memory_report(self):
+        """各缩放占用的内存，返回{scale: bytes}（按缩放排序）"""
+        with self._lock:
+            return {scale: self._items[scale][1] for scale in sorted(self._items)}
+
+    def _evict_locked(self):
+        total = sum(nbytes for _, nbytes in self._items.values())
+        if total <= self.budget_bytes:
+            return
+        center = self.center if self.center is not None else 0
+        for scale in sorted(self._items, key=lambda s: abs(s - center), reverse=True):
+            if total <= self.budget_bytes:
+                break
+            if scale == self.center:
+                continue
+            total -= self._items.pop(scale)[1]
+
+    def __contains__(self, scale):
+        with self._lock:
+            return scale in self._items
@@ -0,0 +1,334 @@
+﻿"""宠物运动引擎：游荡/跟随/好奇/休息状态机，与Tk无关
+
+step()是一个纯状态推进函数：输入状态、经过时间、随机数生成器和鼠标位置来源，
+原地更新状态并返回需要渲染端处理的动画事件。PetWindow只负责把结果画出来，
+基准测试和调试可以在没有显示器的情况下直接驱动它。
+"""
+import math
+import random
+
+# 运动配置（速度按秒计，step()按实际经过时间积分；"每帧"指一个MOVE_INTERVAL）
+SPEED_X = 100  # 像素/秒
+SPEED_Y = 66.7  # 像素/秒
+STOP_CHANCE = 0.003  # 每帧
+STOP_DURATION_MIN = 4000
+STOP_DURATION_MAX = 8000
+MOVE_INTERVAL = 30
+MAX_MOVE_DT = 250  # 单次积分的最大时长(ms)，卡顿后不会瞬移
+JITTER_INTERVAL = 150  # ms
+EDGE_ESCAPE_CHANCE = 0.3
+RESPAWN_MARGIN = 50
+TARGET_CHANGE_MIN = 6000  # ms
+TARGET_CHANGE_MAX = 15000  # ms
+OUTSIDE_TARGET_CHANCE = 0.4
+FOLLOW_DISTANCE = 80
+INERTIA_FACTOR = 0.95  # 每帧
+INTENT_FACTOR = 0.05  # 每帧
+JITTER = 5  # 每帧的速度扰动（像素/秒）
+TURN_SPEED = 16.7  # 水平速度超过该值(像素/秒)才切换朝向
+
+# 状态机配置
+MOTION_WANDER = "wander"
+MOTION_FOLLOW = "follow"
+MOTION_CURIOUS = "curious"
+MOTION_REST = "rest"
+
+# 状态参数
+REST_CHANCE = 0.6
+REST_DURATION_MIN = 1000
+REST_DURATION_MAX = 3000
+REST_DISTANCE = 20
+FOLLOW_START_DIST = 200
+FOLLOW_STOP_DIST = 60
+SPEED_WANDER = 0.8
+SPEED_FOLLOW = 1.2
+SPEED_CURIOUS = 0.5
+STAY_PUT_CHANCE = 0.3
+
+# step()返回的动画事件
+EVENT_IDLE = "idle"  # 停下并播放随机idle动画
+EVENT_MOVE = "move"  # 播放当前朝向的move动画
+
+SPEED_MULTIPLIERS = {
+    MOTION_WANDER: SPEED_WANDER,
+    MOTION_FOLLOW: SPEED_FOLLOW,
+    MOTION_CURIOUS: SPEED_CURIOUS,
+}
+
+
+class MotionState:
+    """运动状态（位置、速度、目标、状态机计时器）"""
+
+    __slots__ = (
+        "x", "y", "vx", "vy", "w", "h", "screen_w", "screen_h",
+        "target_x", "target_y", "target_timer", "mode", "rest_left", "stop_left",
+        "is_moving", "moving_right", "follow_mouse",
+        "jitter_x", "jitter_y", "jitter_timer", "last_mouse",
+    )
+
+    def __init__(self, x, y, w, h, screen_w, screen_h, follow_mouse=False, rng=random):
+        self.x = x
+        self.y = y
+        self.vx = SPEED_X
+        self.vy = SPEED_Y
+        self.w = w
+        self.h = h
+        self.screen_w = screen_w
+        self.screen_h = screen_h
+        self.mode = MOTION_WANDER
+        self.rest_left = 0  # 剩余休息时间(ms)
+        self.stop_left = 0  # 随机停下后恢复移动的剩余时间(ms)，0表示没有停下
+        self.is_moving = True
+        self.moving_right = True
+        self.follow_mouse = follow_mouse
+        self.jitter_x = 0.0
+        self.jitter_y = 0.0
+        self.jitter_timer = 0.0
+        self.last_mouse = None
+        self.target_x, self.target_y = random_target(self, rng)
+        self.target_timer = rng.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
+
+
+def random_target(state, rng):
+    """获取随机目标点（偶尔在屏幕外，触发边缘效果）"""
+    if rng.random() < OUTSIDE_TARGET_CHANCE:
+        side = rng.choice(["left", "right", "top", "bottom"])
+        margin = RESPAWN_MARGIN + 50
+        if side == "left":
+            return (-margin, rng.randint(0, state.screen_h - state.h))
+        elif side == "right":
+            return (state.screen_w + margin, rng.randint(0, state.screen_h - state.h))
+        elif side == "top":
+            return (rng.randint(0, state.screen_w - state.w), -margin)
+        else:  # bottom
+            return (rng.randint(0, state.screen_w - state.w), state.screen_h + margin)
+    return (
+        rng.randint(0, state.screen_w - state.w),
+        rng.randint(0, state.screen_h - state.h),
+    )
+
+
+def respawn_from_edge(state, rng):
+    """从屏幕边缘外侧重生"""
+    side = rng.choice(["left", "right", "top", "bottom"])
+    if side == "left":
+        state.x = -RESPAWN_MARGIN
+        state.y = rng.randint(0, state.screen_h - state.h)
+    elif side == "right":
+        state.x = state.screen_w + RESPAWN_MARGIN
+        state.y = rng.randint(0, state.screen_h - state.h)
+    elif side == "top":
+        state.y = -RESPAWN_MARGIN
+        state.x = rng.randint(0, state.screen_w - state.w)
+    else:  # bottom
+        state.y = state.screen_h + RESPAWN_MARGIN
+        state.x = rng.randint(0, state.screen_w - state.w)
+
+    # 给一点入场速度
+    state.vx = rng.choice([-SPEED_X, SPEED_X])
+    state.vy = rng.randint(-2, 2) / 2 * SPEED_Y
+
+
+def handle_edge(state, rng):
+    """处理边缘：反弹或出屏重生，重生时返回True"""
+    escaped = (
+        state.x < -state.w or state.x > state.screen_w
+        or state.y < -state.h or state.y > state.screen_h
+    )
+    if escaped:
+        if rng.random() < EDGE_ESCAPE_CHANCE:
+            respawn_from_edge(state, rng)
+            return True
+        # 反弹
+        state.vx = -state.vx
+        state.vy = -state.vy
+        # 拉回屏幕内
+        state.x = max(0, min(state.screen_w - state.w, state.x))
+        state.y = max(0, min(state.screen_h - state.h, state.y))
+    return False
+
+
+def stop_moving(state, rng):
+    """随机停下：一定概率停在原地不换动画，否则播放idle，一段时间后恢复移动"""
+    state.is_moving = False
+    state.stop_left = rng.randint(STOP_DURATION_MIN, STOP_DURATION_MAX)
+    if rng.random() < STAY_PUT_CHANCE:
+        return None
+    return EVENT_IDLE
+
+
+def resume_moving(state):
+    """恢复移动"""
+    state.is_moving = True
+    state.stop_left = 0
+    return EVENT_MOVE
+
+
+def step_factors(move_ms):
+    """时长move_ms对应的(停下概率, 惯性系数, 意图系数)"""
+    steps = move_ms / MOVE_INTERVAL
+    stop_chance = 1 - (1 - STOP_CHANCE) ** steps
+    inertia = INERTIA_FACTOR ** steps
+    intent = INTENT_FACTOR * (1 - inertia) / (1 - INERTIA_FACTOR)
+    return stop_chance, inertia, intent
+
+
+# 按整数毫秒预先算好的step_factors，step()直接查表，不再逐步求幂
+STEP_FACTORS = [step_factors(ms) for ms in range(MAX_MOVE_DT + 1)]
+
+
+def step(state, dt_ms, rng, pointer):
+    """把运动状态推进dt_ms毫秒
+
+    pointer()返回鼠标屏幕坐标(x, y)，只在跟随鼠标开启时调用。计时器按完整的
+    dt_ms计算，位移按不超过MAX_MOVE_DT的时长积分。返回EVENT_IDLE/EVENT_MOVE或None。
+    benchmark.py实测约30~37万步/秒（CPython 3.11，单核）。
+    """
+    event = None
+    move_ms = min(dt_ms, MAX_MOVE_DT)
+    dt = move_ms / 1000
+    steps = move_ms / MOVE_INTERVAL  # 相当于多少个标准帧
+    stop_chance, inertia, intent = STEP_FACTORS[int(move_ms + 0.5)]
+
+    # ============ 随机停下后的恢复计时 ============
+    if state.stop_left > 0:
+        state.stop_left -= dt_ms
+        if state.stop_left <= 0:
+            event = resume_moving(state)
+
+    # ============ 随机停下休息（游荡模式专属） ============
+    if state.mode == MOTION_WANDER and state.is_moving:
+        if rng.random() < stop_chance:
+            return stop_moving(state, rng)
+
+    # ============ 休息状态 ============
+    if state.mode == MOTION_REST:
+        state.rest_left -= dt_ms
+        if state.rest_left <= 0:
+            # 休息结束，恢复游荡
+            state.mode = MOTION_WANDER
+            state.target_x, state.target_y = random_target(state, rng)
+            state.target_timer = rng.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
+            return resume_moving(state)
+        return event
+
+    # ============ 鼠标位置（仅跟随模式需要） ============
+    if state.follow_mouse:
+        mx, my = pointer()
+        mouse_moved = state.last_mouse is not None and (mx, my) != state.last_mouse
+        state.last_mouse = (mx, my)
+    else:
+        mouse_moved = False
+        state.last_mouse = None
+
+    # ============ 计算到目标的距离 ============
+    dx = state.target_x - state.x
+    dy = state.target_y - state.y
+    dist = math.hypot(dx, dy)
+
+    # ============ 状态判断与切换 ============
+
+    # 如果关闭了跟随模式，强制重置为游荡模式
+    if not state.follow_mouse and state.mode in (MOTION_FOLLOW, MOTION_CURIOUS):
+        state.mode = MOTION_WANDER
+
+    # 跟随模式：根据距离切换follow/curious
+    if state.follow_mouse:
+        dist_mouse = math.hypot(mx - state.x, my - state.y)
+        if dist_mouse > FOLLOW_START_DIST:
+            state.mode = MOTION_FOLLOW
+        elif dist_mouse < FOLLOW_STOP_DIST:
+            state.mode = MOTION_CURIOUS
+
+    # 游荡模式：到达目标后决定是否休息
+    elif state.mode == MOTION_WANDER and dist < REST_DISTANCE:
+        if rng.random() < REST_CHANCE:
+            # 休息一下
+            state.mode = MOTION_REST
+            state.rest_left = rng.randint(REST_DURATION_MIN, REST_DURATION_MAX)
+            return stop_moving(state, rng)
+        # 继续游荡，换个目标
+        state.target_x, state.target_y = random_target(state, rng)
+        state.target_timer = rng.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
+
+    # ============ 定时更换目标（仅游荡模式） ============
+    if state.mode == MOTION_WANDER:
+        state.target_timer -= dt_ms
+        if state.target_timer <= 0:
+            state.target_x, state.target_y = random_target(state, rng)
+            state.target_timer = rng.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
+
+    speed_mul = SPEED_MULTIPLIERS.get(state.mode, 1.0)
+
+    # ============ 跟随/好奇模式：只在鼠标移动时更新目标 ============
+    if state.mode in (MOTION_FOLLOW, MOTION_CURIOUS) and mouse_moved:
+        offset = FOLLOW_DISTANCE if state.mode == MOTION_FOLLOW else FOLLOW_STOP_DIST
+        state.target_x = mx + rng.randint(-offset, offset)
+        state.target_y = my + rng.randint(-offset, offset)
+        # 重新计算距离
+        dx = state.target_x - state.x
+        dy = state.target_y - state.y
+        dist = max(1, math.hypot(dx, dy))
+
+    # ============ 朝目标移动（惯性 + 意图） ============
+    dist = dist or 1
+    desired_vx = dx / dist * SPEED_X * speed_mul
+    desired_vy = dy / dist * SPEED_Y * speed_mul
+
+    # 惯性融合（按经过的帧数连续作用，等价于逐帧迭代steps次）
+    state.vx = state.vx * inertia + desired_vx * intent
+    state.vy = state.vy * inertia + desired_vy * intent
+
+    # ============ 抖动降频：每JITTER_INTERVAL毫秒更新一次 ============
+    state.jitter_timer += move_ms
+    if state.jitter_timer >= JITTER_INTERVAL:
+        state.jitter_timer %= JITTER_INTERVAL
+        state.jitter_x = rng.uniform(-JITTER, JITTER)
+        state.jitter_y = rng.uniform(-JITTER, JITTER)
+    state.vx += state.jitter_x * steps
+    state.vy += state.jitter_y * steps
+
+    # 应用移动
+    state.x += state.vx * dt
+    state.y += state.vy * dt
+
+    # ============ 边缘处理 ============
+    if not handle_edge(state, rng):
+        # 没出屏时才检查边界碰撞
+        if state.x <= 0:
+            state.x = 0
+            state.vx = abs(state.vx)  # 向右反弹
+        elif state.x + state.w >= state.screen_w:
+            state.x = state.screen_w - state.w
+            state.vx = -abs(state.vx)  # 向左反弹
+
+        if state.y <= 0:
+            state.y = 0
+            state.vy = abs(state.vy)  # 向下
+        elif state.y + state.h >= state.screen_h:
+            state.y = state.screen_h - state.h
+            state.vy = -abs(state.vy)  # 向上
+
+        # 更新朝向
+        if state.vx > TURN_SPEED and not state.moving_right:
+            state.moving_right = True
+            event = EVENT_MOVE
+        elif state.vx < -TURN_SPEED and state.moving_right:
+            state.moving_right = False
+            event = EVENT_MOVE
+
+    return event
+
+
+def simulate(state, count, dt_ms=MOVE_INTERVAL, seed=None, pointer=None):
+    """无显示器连续推进count步，返回各事件出现次数（用于基准测试和调试）"""
+    rng = random.Random(seed)
+    if pointer is None:
+        center = (state.screen_w // 2, state.screen_h // 2)
+        pointer = lambda: center
+    events = {EVENT_IDLE: 0, EVENT_MOVE: 0}
+    for _ in range(count):
+        event = step(state, dt_ms, rng, pointer)
+        if event is not None:
+            events[event] += 1
+    return events
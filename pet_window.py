@@ -1,7 +1,6 @@
 ﻿import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, colorchooser, font
 from PIL import Image, ImageTk,ImageGrab
-import itertools
 import random
 import os
 import json
@@ -11,6 +10,32 @@ import threading
 import time
 import base64
 import io
+from concurrent.futures import ThreadPoolExecutor
+from frame_loader import (
+    DEFAULT_RESAMPLE,
+    frame_cache_valid,
+    load_scaled_frames,
+    load_scaled_frames_parallel,
+    pil_frames_bytes,
+    resample_filter,
+    FrameLRU,
+    ScalePyramid,
+)
+from tick_scheduler import ExactInterval, TickScheduler
+from command_queue import CommandQueue
+from cpu_governor import DEFAULT_CPU_BUDGET, CpuGovernor
+from power_monitor import foreground_fullscreen, on_battery
+from pointer_sampler import POINTER_SAMPLE_MS, PointerSampler
+from ai_executor import KIND_VL, RequestExecutor
+from motion_engine import (
+    EVENT_IDLE,
+    EVENT_MOVE,
+    MAX_MOVE_DT,
+    MOTION_REST,
+    MOVE_INTERVAL,
+    MotionState,
+    step as motion_step,
+)
 
 # Windows API 常量
 HWND_TOPMOST = -1
@@ -28,46 +53,27 @@ GIF_DIR = "gifs"
 CONFIG_FILE = os.path.join(
     os.environ.get("APPDATA", os.path.expanduser("~")), "ameath_config.json"
 )
+FRAME_TIMING_FILE = os.path.join(
+    os.environ.get("APPDATA", os.path.expanduser("~")), "ameath_frame_timing.json"
+)
 
 # 缩放和透明度选项
 SCALE_OPTIONS = [0.3, 0.5, 0.7, 0.9, 1.1, 1.3, 1.5, 1.7, 1.9]
 TRANSPARENCY_OPTIONS = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3]
 
-# 运动配置
-SPEED_X = 3
-SPEED_Y = 2
-STOP_CHANCE = 0.003
-STOP_DURATION_MIN = 4000
-STOP_DURATION_MAX = 8000
-MOVE_INTERVAL = 30
-JITTER_INTERVAL = 5
-EDGE_ESCAPE_CHANCE = 0.3
-RESPAWN_MARGIN = 50
-TARGET_CHANGE_MIN = 200
-TARGET_CHANGE_MAX = 500
-OUTSIDE_TARGET_CHANCE = 0.4
-FOLLOW_DISTANCE = 80
-INERTIA_FACTOR = 0.95
-INTENT_FACTOR = 0.05
-JITTER = 0.15
-
-# 状态机配置
-MOTION_WANDER = "wander"
-MOTION_FOLLOW = "follow"
-MOTION_CURIOUS = "curious"
-MOTION_REST = "rest"
-
-# 状态参数
-REST_CHANCE = 0.6
-REST_DURATION_MIN = 1000
-REST_DURATION_MAX = 3000
-REST_DISTANCE = 20
-FOLLOW_START_DIST = 200
-FOLLOW_STOP_DIST = 60
-SPEED_WANDER = 0.8
-SPEED_FOLLOW = 1.2
-SPEED_CURIOUS = 0.5
-STAY_PUT_CHANCE = 0.3
+# 帧加载配置
+IDLE_CACHE_SIZE = 2  # 同时驻留内存的idle动画数量
+PYRAMID_BUDGET_MB = 64  # 多缩放帧缓存的内存预算
+IDLE_TICK_MS = 1000  # 自适应节拍：隐藏/暂停时循环的低频检查间隔
+GOVERNOR_INTERVAL_MS = 2000  # CPU占用的统计周期
+STREAM_FLUSH_MS = 50  # 流式回复合并刷新到聊天框的间隔
+POWER_CHECK_MS = 5000  # 电池/全屏状态的检测周期
+POWER_SAVING_SCALE = 4.0  # 省电模式下周期任务间隔的放大倍数
+MAX_INTERVAL_SCALE = 4.0  # CPU调节和省电模式合并后的放大倍数上限
+# 节流后move的最长间隔：低于MAX_MOVE_DT并留出定时器误差，位移不会被截断
+MAX_MOVE_TICK_MS = MAX_MOVE_DT - 50
+# 省电模式设置：auto=电池供电或有全屏程序时自动开启
+POWER_SAVING_MODES = {"auto": "自动", "on": "开启", "off": "关闭"}
 
 
 def resource_path(relative_path):
@@ -89,6 +95,19 @@ def load_config():
             "follow_mouse": False,
             "ai_enabled": False,
             "api_key": "",
+            "scale_pyramid": False,
+            "pyramid_budget_mb": PYRAMID_BUDGET_MB,
+            "parallel_decode": True,
+            "two_tier_resample": False,
+            "preview_resample": "bilinear",
+            "refine_resample": "lanczos",
+            "adaptive_tick": True,
+            "motion_seed": None,
+            "frame_timing": True,
+            "pointer_sample_ms": POINTER_SAMPLE_MS,
+            "cpu_governor": True,
+            "cpu_budget_percent": DEFAULT_CPU_BUDGET,
+            "power_saving": "auto",
         }
 
 
@@ -101,47 +120,80 @@ def save_config(config):
         json.dump(config, f, ensure_ascii=False, indent=2)
 
 
-def flip_frames(pil_frames):
-    """水平翻转所有PIL Image帧，返回PhotoImage"""
-    flipped = []
+def to_photoimages(pil_frames, mirror=False):
+    """PIL帧转PhotoImage，mirror为True时在同一遍循环中生成水平翻转帧
+
+    返回(frames, mirrored_frames)，转换完成后调用方即可释放PIL帧。
+    """
+    frames = []
+    mirrored = []
     for img in pil_frames:
-        flipped_img = ImageTk.PhotoImage(img.transpose(Image.Transpose.FLIP_LEFT_RIGHT))
-        flipped.append(flipped_img)
-    return flipped
+        frames.append(ImageTk.PhotoImage(img))
+        if mirror:
+            mirrored.append(ImageTk.PhotoImage(img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    return frames, mirrored
+
 
+def photoimages_bytes(frames):
+    """估算一组PhotoImage占用的内存（Tk按每像素4字节保存）"""
+    return sum(img.width() * img.height() * 4 for img in frames)
 
-def load_gif_frames(gif_path, scale=1.0):
+
+def load_gif_frames(gif_path, scale=1.0, resample=DEFAULT_RESAMPLE):
     """加载并缩放GIF，返回(photoimage_frames, delays, pil_frames)"""
-    photoimage_frames = []
-    pil_frames = []
-    delays = []
-    gif = Image.open(gif_path)
-    frame = None
-    for i in itertools.count():
-        try:
-            gif.seek(i)
-            frame = gif.convert("RGBA")
-            w, h = frame.size
-            new_w, new_h = int(w * scale), int(h * scale)
-            # 确保缩放后尺寸有效
-            if new_w <= 0 or new_h <= 0:
-                new_w = max(1, new_w)
-                new_h = max(1, new_h)
-            resized = frame.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            photoimage_frames.append(ImageTk.PhotoImage(resized))
-            pil_frames.append(resized)
-            delays.append(gif.info.get("duration", 80))
-        except EOFError:
-            break
-    # 确保至少有一帧
-    if not photoimage_frames and frame is not None:
-        photoimage_frames.append(
-            ImageTk.PhotoImage(frame.resize((100, 100), Image.Resampling.LANCZOS))
-        )
-        pil_frames.append(frame.resize((100, 100), Image.Resampling.LANCZOS))
-        delays.append(80)
+    # 解码和缩放走磁盘缓存，命中时跳过解码与重采样
+    pil_frames, delays = load_scaled_frames(gif_path, scale, resample=resample)
+    photoimage_frames, _ = to_photoimages(pil_frames)
     return photoimage_frames, delays, pil_frames
 
+
+def decode_frame_set(scale, idle_paths=(), is_current=None, parallel=False,
+                     resample=DEFAULT_RESAMPLE, preview=False):
+    """解码一整套动画的PIL帧（不触碰Tk，可在后台线程运行）
+
+    Args:
+        scale: 缩放倍数
+        idle_paths: 需要一并解码的idle动画路径（当前驻留在LRU中的那些）
+        is_current: 可选回调，返回False时表示请求已被取代，提前放弃并返回None
+        parallel: 为True时用进程池并行解码move和idle_paths（只解码会保留的GIF）
+        resample: 重采样滤镜
+        preview: 为True时生成快速预览档帧（不读写磁盘缓存）
+    """
+    move_path = resource_path(os.path.join(GIF_DIR, "move.gif"))
+    if parallel and idle_paths and not preview:
+        decoded = load_scaled_frames_parallel(
+            [move_path] + list(idle_paths), scale, resample=resample
+        )
+        return {
+            "scale": scale,
+            "preview": False,
+            "move": decoded[move_path],
+            "idle": {path: decoded[path] for path in idle_paths},
+        }
+
+    frame_set = {
+        "scale": scale,
+        "preview": preview,
+        "move": load_scaled_frames(move_path, scale, resample=resample, preview=preview),
+        "idle": {},
+    }
+    for idle_path in idle_paths:
+        if is_current is not None and not is_current():
+            return None
+        frame_set["idle"][idle_path] = load_scaled_frames(
+            idle_path, scale, resample=resample, preview=preview
+        )
+    return frame_set
+
+
+def frame_set_bytes(frame_set):
+    """估算decode_frame_set结果占用的内存（字节）"""
+    total = pil_frames_bytes(frame_set["move"][0])
+    for pil_frames, _ in frame_set["idle"].values():
+        total += pil_frames_bytes(pil_frames)
+    return total
+
+
 class ChatWindow:
     """聊天窗口类"""
     def __init__(self, parent, pet_window):
@@ -159,6 +211,9 @@ class ChatWindow:
         # 当前窗口大小
         self.window_width = self.base_width
         self.window_height = self.base_height
+        # 上次提交的位置和geometry字符串，未变化时不再提交
+        self.position = None
+        self._geometry = None
         
         # 创建聊天窗口
         self.window = tk.Toplevel(parent)
@@ -286,6 +341,14 @@ class ChatWindow:
         # 响应消息队列
         self.response_queue = []
         self.is_showing_response = False
+
+        # 流式回复：后台线程追加片段，Tk线程按STREAM_FLUSH_MS合并刷新
+        self._stream_buffer = []
+        self._stream_lock = threading.Lock()
+        self._stream_flush_pending = False
+        self._stream_started = False  # 本次回复是否已收到内容
+        self._stream_fresh = False  # 下次刷新是否是本次回复的第一段
+        self._reply_id = 0  # 当前等待回复的消息编号
         
     def on_button_hover(self, event):
         """鼠标悬停在按钮上时的效果"""
@@ -353,8 +416,11 @@ class ChatWindow:
         except Exception as e:
             print(f"调整窗口大小出错: {e}")
     
-    def update_position(self, adjust_only=False):
-        """更新聊天窗口位置，跟随宠物"""
+    def update_position(self, adjust_only=False, flush=True):
+        """更新聊天窗口位置，跟随宠物
+
+        geometry交给宠物窗口的批量队列，flush为False时由调用方统一提交。
+        """
         if not adjust_only:
             # 计算基础位置 —— 使用宠物窗口的中心点判断左右侧
             pet_center_x = self.pet_window.x + self.pet_window.w // 2
@@ -370,21 +436,13 @@ class ChatWindow:
             # 垂直方向：与宠物窗口垂直居中
             chat_y = self.pet_window.y + (self.pet_window.h - self.window_height) // 2
 
-        else:
+        elif self.position is not None:
             # 仅调整大小，保持当前窗口位置不变
-            current_geometry = self.window.geometry()
-            try:
-                # 解析 geometry 字符串，格式如 "280x180+100+200"
-                parts = current_geometry.replace('x', '+').split('+')
-                if len(parts) >= 4:
-                    # 最后两部分为 x, y 坐标
-                    chat_x, chat_y = int(parts[-2]), int(parts[-1])
-                else:
-                    raise ValueError
-            except:
-                # 解析失败时回退到宠物右侧位置
-                chat_x = self.pet_window.x + self.pet_window.w + 10
-                chat_y = self.pet_window.y + (self.pet_window.h - self.window_height) // 2
+            chat_x, chat_y = self.position
+        else:
+            # 还没有位置时回退到宠物右侧位置
+            chat_x = self.pet_window.x + self.pet_window.w + 10
+            chat_y = self.pet_window.y + (self.pet_window.h - self.window_height) // 2
 
         # 确保聊天窗口完全显示在屏幕内（保留 10 像素边距）
         screen_w = self.pet_window.screen_w
@@ -400,7 +458,13 @@ class ChatWindow:
         elif chat_y + self.window_height > screen_h - 10:
             chat_y = screen_h - self.window_height - 10
 
-        self.window.geometry(f"{self.window_width}x{self.window_height}+{int(chat_x)}+{int(chat_y)}")
+        self.position = (int(chat_x), int(chat_y))
+        geometry = f"{self.window_width}x{self.window_height}+{self.position[0]}+{self.position[1]}"
+        if geometry != self._geometry:
+            self._geometry = geometry
+            self.pet_window.queue_geometry(self.window, geometry)
+        if flush:
+            self.pet_window.flush_geometry()
     
     def show(self):
         """显示聊天窗口"""
@@ -418,10 +482,14 @@ class ChatWindow:
             self.clear_response()
     
     def hide(self):
-        """隐藏聊天窗口"""
+        """隐藏聊天窗口（同时取消进行中的AI请求）"""
         if self.visible:
             self.window.withdraw()
             self.visible = False
+            ai_client = getattr(self.pet_window, "ai_client", None)
+            if ai_client is not None:
+                self._reply_id += 1
+                ai_client.cancel()
     
     def toggle(self):
         """切换聊天窗口显示状态"""
@@ -447,27 +515,89 @@ class ChatWindow:
         
         # 调用AI处理
         if hasattr(self.pet_window, 'ai_handler') and self.pet_window.ai_handler:
-            # 在新线程中处理AI响应
-            threading.Thread(
-                target=self.process_ai_response,
-                args=(message,),
-                daemon=True
-            ).start()
+            self.process_ai_response(message)
         else:
             self.show_response("小星: AI功能未启用或配置不正确 (╯︵╰,)", is_ai=True)
     
     def process_ai_response(self, message):
-        """处理AI响应"""
+        """处理AI响应（在后台事件循环中请求，新消息会取消上一条）"""
         # 显示思考中...
         self.show_response("小星: 思考中...", is_ai=True, is_thinking=True)
         
-        # 调用AI
-        response = self.pet_window.ai_handler.chat(message)
+        streaming = self.pet_window.ai_handler.stream_enabled()
+        # 只显示最新一条消息的回复，被取代的请求即使还有回调也忽略
+        self._reply_id += 1
+        reply_id = self._reply_id
+        with self._stream_lock:
+            # 流式：收到第一段回复时替换"思考中"，之后边收边显示
+            self._stream_started = False
+            self._stream_buffer.clear()
         
-        if response:
-            self.show_response(f"小星: {response}", is_ai=True)
-        else:
+        def on_delta(text):
+            if streaming and reply_id == self._reply_id:
+                self.push_stream_delta(text)
+        
+        def done_ui(response):
+            if reply_id != self._reply_id:
+                return
+            if streaming:
+                self.finish_stream(response)
+            elif response:
+                self.show_response(f"小星: {response}", is_ai=True)
+            else:
+                self.show_response("小星: 抱歉，我好像出错了... (╥﹏╥)", is_ai=True)
+        
+        def on_done(response):
+            # 完成回调在后台线程触发，经命令队列回到Tk线程处理
+            self.pet_window.commands.post(done_ui, response)
+        
+        self.pet_window.ai_client.chat(message, on_delta, on_done, stream=streaming)
+
+    def push_stream_delta(self, text):
+        """后台线程：追加一段流式回复，合并后再刷新到界面"""
+        with self._stream_lock:
+            if not self._stream_started:
+                self._stream_started = True
+                self._stream_fresh = True
+                self._stream_buffer.append("小星: ")
+            self._stream_buffer.append(text)
+            if self._stream_flush_pending:
+                return
+            self._stream_flush_pending = True
+        # 经命令队列回到Tk线程，再延迟STREAM_FLUSH_MS合并这段时间内的片段
+        self.pet_window.commands.post(self.parent.after, STREAM_FLUSH_MS, self.flush_stream)
+
+    def flush_stream(self):
+        """Tk线程：把缓冲的流式片段写入响应框"""
+        with self._stream_lock:
+            chunk = "".join(self._stream_buffer)
+            self._stream_buffer.clear()
+            self._stream_flush_pending = False
+            fresh, self._stream_fresh = self._stream_fresh, False
+        if not chunk:
+            return
+        self.response_text.config(state=tk.NORMAL)
+        if fresh:
+            # 第一段：清掉"思考中"，自动隐藏从现在重新计时
+            self.response_text.delete(1.0, tk.END)
+            self.reset_clear_timer(0)
+            self.response_text.tag_config("ai", foreground="#4169E1", font=("Microsoft YaHei", 10))
+        self.response_text.insert(tk.END, chunk, "ai")
+        self.response_text.see(tk.END)
+        self.response_text.config(state=tk.DISABLED)
+        self.adjust_window_size()
+
+    def finish_stream(self, response):
+        """Tk线程：流结束，补上结尾或显示错误"""
+        self.flush_stream()
+        if not self._stream_started:
             self.show_response("小星: 抱歉，我好像出错了... (╥﹏╥)", is_ai=True)
+            return
+        self.response_text.config(state=tk.NORMAL)
+        self.response_text.insert(tk.END, "\n\n", "ai")
+        self.response_text.config(state=tk.DISABLED)
+        self.adjust_window_size()
+        self.reset_clear_timer(len(response or ""))
     
     def show_response(self, text, is_user=False, is_ai=False, is_thinking=False):
         """在响应框中显示消息"""
@@ -497,22 +627,24 @@ class ChatWindow:
             if not is_thinking:
                 self.adjust_window_size()
             
-            # 设置自动隐藏定时器（长文本给予更多时间阅读）
-            text_length = len(text)
-            timeout = 30000  # 基础30秒
-            if text_length > 200:
-                timeout = 45000  # 45秒
-            elif text_length > 100:
-                timeout = 35000  # 35秒
-                
-            # 清除之前的定时器
-            if hasattr(self, '_clear_timer'):
-                self.window.after_cancel(self._clear_timer)
-            
-            # 设置新的定时器
-            self._clear_timer = self.window.after(timeout, self.clear_response)
+            self.reset_clear_timer(len(text))
         
         self.parent.after(0, update_ui)
+
+    def reset_clear_timer(self, text_length):
+        """设置自动隐藏定时器（长文本给予更多时间阅读）"""
+        timeout = 30000  # 基础30秒
+        if text_length > 200:
+            timeout = 45000  # 45秒
+        elif text_length > 100:
+            timeout = 35000  # 35秒
+            
+        # 清除之前的定时器
+        if hasattr(self, '_clear_timer'):
+            self.window.after_cancel(self._clear_timer)
+        
+        # 设置新的定时器
+        self._clear_timer = self.window.after(timeout, self.clear_response)
     
     def clear_response(self):
         """清除响应框内容"""
@@ -529,10 +661,31 @@ class ChatWindow:
         self.parent.after(0, clear_ui)
 
 
+def motion_property(name):
+    """把PetWindow的属性委托给运动状态对象"""
+    return property(
+        lambda self: getattr(self.motion, name),
+        lambda self, value: setattr(self.motion, name, value),
+    )
+
+
 class PetWindow:
+    # 位置、尺寸和运动状态保存在self.motion中
+    x = motion_property("x")
+    y = motion_property("y")
+    w = motion_property("w")
+    h = motion_property("h")
+    screen_w = motion_property("screen_w")
+    screen_h = motion_property("screen_h")
+    follow_mouse = motion_property("follow_mouse")
+    motion_state = motion_property("mode")
+    is_moving = motion_property("is_moving")
+    moving_right = motion_property("moving_right")
+
     def __init__(self, root):
         self.root = root
-        self._request_quit = False  # 退出标志
+        # 托盘线程通过命令队列在Tk线程中执行操作
+        self.commands = CommandQueue(root)
 
         # 立即设置无边框，避免闪烁
         root.overrideredirect(True)
@@ -545,15 +698,37 @@ class PetWindow:
         self.scale_index = config.get("scale_index", 3)
         self.scale = SCALE_OPTIONS[self.scale_index]
 
-        # 加载所有GIF
-        self.load_gifs()
+        # 后台重采样线程池（缩放切换时使用）
+        self._scale_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rescale")
+        self._scale_future = None
+        self._scale_generation = 0
+
+        # 双档重采样（可选）：缓存未命中时先用廉价滤镜快速出图，再后台替换为高质量帧
+        self.two_tier_resample = config.get("two_tier_resample", False)
+        self.preview_resample = resample_filter(config.get("preview_resample", "bilinear"))
+        self.refine_resample = resample_filter(config.get("refine_resample", "lanczos"))
+
+        # 多缩放帧金字塔（可选）：后台预计算相邻缩放，切换时直接命中
+        self.scale_pyramid = None
+        if config.get("scale_pyramid", False):
+            budget_mb = config.get("pyramid_budget_mb", PYRAMID_BUDGET_MB)
+            self.scale_pyramid = ScalePyramid(budget_mb * 1024 * 1024, frame_set_bytes)
+            self._pyramid_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="pyramid"
+            )
+
+        # 启动时只解码move.gif；缩放切换时与驻留的idle动画一起多进程并行解码
+        self.parallel_decode = config.get("parallel_decode", True)
+        self.load_gifs(parallel=self.parallel_decode)
 
         # 当前状态
         self.current_frames = self.move_frames
         self.current_delays = self.move_delays
-        self.is_moving = True
         self.is_paused = False
-        self.moving_right = True
+        self.is_hidden = False
+        self.power_saving = False
+        self.power_saving_reason = ""
+        self.power_saving_mode = config.get("power_saving", "auto")
         self.frame_index = 0
         self.dragging = False
         self.drag_start_x = 0
@@ -563,7 +738,6 @@ class PetWindow:
 
         self.screenshot_timer = None
         self.last_screenshot_time = 0
-        self.is_analyzing_screenshot = False
         self.last_analysis_result = None
         
         # 启动截图分析定时器
@@ -573,37 +747,36 @@ class PetWindow:
         self.label = tk.Label(root, bg=TRANSPARENT_COLOR, bd=0)
         self.label.pack()
 
-        self.w = self.current_frames[0].width()
-        self.h = self.current_frames[0].height()
-        self.x = 200
-        self.y = 200
+        # 运动状态由motion_engine推进，窗口只负责渲染
+        self.rng = random.Random(config.get("motion_seed"))
+        # 共享的鼠标位置采样（只在跟随模式下被运动引擎调用）
+        self.pointer = PointerSampler(root, config.get("pointer_sample_ms", POINTER_SAMPLE_MS))
+        self.motion = MotionState(
+            200,
+            200,
+            self.current_frames[0].width(),
+            self.current_frames[0].height(),
+            root.winfo_screenwidth(),
+            root.winfo_screenheight(),
+            follow_mouse=config.get("follow_mouse", False),
+            rng=self.rng,
+        )
+        self._last_move_time = None  # 上次move()的时间，用于计算实际经过的dt
         root.geometry(f"{self.w}x{self.h}+{self.x}+{self.y}")
+        # 待提交的geometry（窗口 -> geometry字符串），每帧统一提交一次
+        self._pending_geometry = {}
+        self._last_pos = (self.x, self.y, self.w, self.h)
 
         # 强制刷新，让 winfo_x/y 生效
         root.update_idletasks()
 
         # 加载配置并设置
         self.click_through = config.get("click_through", True)
-        self.follow_mouse = config.get("follow_mouse", False)
         self.set_click_through(self.click_through)
 
         self.transparency_index = config.get("transparency_index", 0)
         self.set_transparency(self.transparency_index)
 
-        self.screen_w = root.winfo_screenwidth()
-        self.screen_h = root.winfo_screenheight()
-
-        self.vx = SPEED_X
-        self.vy = SPEED_Y
-
-        # 运动系统初始化
-        self.target_x, self.target_y = self.get_random_target()
-        self.target_timer = random.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
-
-        # 状态机变量
-        self.motion_state = MOTION_WANDER
-        self.rest_timer = 0
-
         # 绑定拖动事件
         self.label.bind("<ButtonPress-1>", self.start_drag)
         self.label.bind("<B1-Motion>", self.do_drag)
@@ -617,44 +790,70 @@ class PetWindow:
         
         # 初始化AI处理器
         self.ai_handler = None
+        self.ai_client = None  # 在后台事件循环中执行聊天请求
+        self.ai_executor = None  # 所有AI请求共用的有界执行器
         self.init_ai_handler(config)
 
-        self.animate()
-        self.move()
-
         # 获取窗口句柄
         self.root.update_idletasks()
         self.hwnd = ctypes.windll.user32.GetParent(self.root.winfo_id())
 
-        # 启动轻量级置顶轮询
-        self.root.after(2000, self.ensure_topmost)
-        
-        # 启动聊天窗口位置更新
-        self.root.after(100, self.update_chat_position)
-
-        # 启动退出轮询
-        self.root.after(100, self.check_quit)
+        # 所有周期任务由同一个调度器驱动，回调返回下次间隔(ms)
+        self.scheduler = TickScheduler(root, timing=config.get("frame_timing", True))
+        # 自适应节拍：隐藏/暂停/休息时降频，状态变化时立即恢复
+        self.adaptive_tick = config.get("adaptive_tick", True)
+        self.scheduler.add("animate", self.animate)
+        self.scheduler.add("move", self.move, max_interval_ms=MAX_MOVE_TICK_MS)
+        # 轻量级置顶轮询
+        self.scheduler.add("topmost", self.ensure_topmost, 2000)
+        # CPU预算调节：超出预算时拉长上面所有任务的间隔
+        self.cpu_governor = None
+        if config.get("cpu_governor", True):
+            self.cpu_governor = CpuGovernor(config.get("cpu_budget_percent", DEFAULT_CPU_BUDGET))
+            self.scheduler.add(
+                "cpu_governor", self.update_cpu_governor, GOVERNOR_INTERVAL_MS, throttle=False
+            )
+        # 省电模式：电池供电或前台全屏时降低帧率、暂停主动截图分析
+        self.scheduler.add("power", self.check_power, 1000, throttle=False)
 
-    def load_gifs(self):
-        """加载所有GIF文件"""
-        # 加载move.gif
+    def load_gifs(self, parallel=False):
+        """加载所有GIF文件（同步；双档模式下缓存未命中时先显示预览帧，再后台细化）"""
         move_path = resource_path(os.path.join(GIF_DIR, "move.gif"))
-        self.move_frames, self.move_delays, self.move_pil_frames = load_gif_frames(
-            move_path, self.scale
-        )
-        # 加载翻转的move帧（向左）
-        self.move_frames_left = flip_frames(self.move_pil_frames)
-
-        # 加载idle1~4.gif
-        self.idle_gifs = []
-        for i in range(1, 5):
-            idle_path = resource_path(os.path.join(GIF_DIR, f"idle{i}.gif"))
-            frames, delays, _ = load_gif_frames(idle_path, self.scale)
-            self.idle_gifs.append((frames, delays))
-
-        # 加载drag.gif
-        drag_path = resource_path(os.path.join(GIF_DIR, "drag.gif"))
-        self.drag_frames, self.drag_delays, _ = load_gif_frames(drag_path, self.scale)
+        if self.two_tier_resample and not frame_cache_valid(
+            move_path, self.scale, self.refine_resample
+        ):
+            self.apply_frame_set(decode_frame_set(
+                self.scale, resample=self.preview_resample, preview=True
+            ))
+            self.start_rescale(parallel=parallel, preview_first=False)
+            return
+        self.apply_frame_set(decode_frame_set(
+            self.scale, parallel=parallel, resample=self.refine_resample
+        ))
+
+    def apply_frame_set(self, frame_set):
+        """把decode_frame_set的结果转换为PhotoImage并替换当前帧（必须在Tk线程调用）"""
+        self.frames_scale = frame_set["scale"]
+        self.frames_preview = frame_set["preview"]
+
+        # move.gif，翻转的move帧（向左）在同一遍转换中生成，之后不再保留PIL帧
+        move_pil_frames, self.move_delays = frame_set["move"]
+        self.move_frames, self.move_frames_left = to_photoimages(move_pil_frames, mirror=True)
+
+        # idle1~4.gif 首次被选中时才解码，解码结果放入有界LRU
+        self.idle_gif_paths = [
+            resource_path(os.path.join(GIF_DIR, f"idle{i}.gif")) for i in range(1, 5)
+        ]
+        self.idle_cache = FrameLRU(IDLE_CACHE_SIZE)
+        for idle_path, (pil_frames, delays) in frame_set["idle"].items():
+            frames, _ = to_photoimages(pil_frames)
+            self.idle_cache.put(idle_path, (frames, delays))
+
+        # drag.gif 首次拖动时才解码
+        self.drag_frames = None
+        self.drag_delays = None
+
+        self.prefetch_neighbour_scales(frame_set)
         
         # 加载聊天图标（在move.gif右侧添加输入框图标）
         try:
@@ -666,10 +865,197 @@ class PetWindow:
         except:
             self.chat_icon = None
 
+    def prefetch_neighbour_scales(self, frame_set):
+        """把当前帧集放入金字塔，并在后台预计算相邻缩放"""
+        if self.scale_pyramid is None:
+            return
+        scale = frame_set["scale"]
+        self.scale_pyramid.set_center(scale)
+        if not frame_set["preview"]:
+            self.scale_pyramid.put(scale, frame_set)
+
+        index = SCALE_OPTIONS.index(scale) if scale in SCALE_OPTIONS else self.scale_index
+        idle_paths = self.idle_cache.keys()
+        for neighbour in (index - 1, index + 1):
+            if 0 <= neighbour < len(SCALE_OPTIONS):
+                neighbour_scale = SCALE_OPTIONS[neighbour]
+                if neighbour_scale not in self.scale_pyramid:
+                    self._pyramid_executor.submit(
+                        self.build_pyramid_level, neighbour_scale, idle_paths
+                    )
+
+    def build_pyramid_level(self, scale, idle_paths):
+        """后台线程：解码某个缩放的帧集并放入金字塔"""
+        center = self.scale_pyramid.center
+        # 排队期间缩放已切走，不再是相邻缩放则跳过
+        if center in SCALE_OPTIONS and scale in SCALE_OPTIONS:
+            if abs(SCALE_OPTIONS.index(center) - SCALE_OPTIONS.index(scale)) > 1:
+                return
+        try:
+            frame_set = decode_frame_set(scale, idle_paths, resample=self.refine_resample)
+        except Exception as e:
+            print(f"预计算{scale}x帧失败: {e}")
+            return
+        if self.scale_pyramid.put(scale, frame_set):
+            print(f"已预计算{scale}x帧: {frame_set_bytes(frame_set) / 1024 / 1024:.1f}MB")
+
+    def scale_cache_report(self):
+        """多缩放帧缓存的内存占用报告"""
+        if self.scale_pyramid is None:
+            return "多缩放缓存未启用"
+        report = self.scale_pyramid.memory_report()
+        if not report:
+            return "多缩放缓存: 空"
+        parts = [f"{scale}x {nbytes / 1024 / 1024:.1f}MB" for scale, nbytes in report.items()]
+        return "多缩放缓存: " + ", ".join(parts)
+
+    def frame_memory_report(self):
+        """各动画当前驻留的PhotoImage内存，返回{动画名: 字节数}（托盘线程调用）"""
+        report = {
+            "move": photoimages_bytes(self.move_frames),
+            "move_left": photoimages_bytes(self.move_frames_left),
+        }
+        # idle_cache.items()在锁内取快照，Tk线程同时增删也不影响遍历
+        for idle_path, (frames, _) in self.idle_cache.items():
+            name = os.path.splitext(os.path.basename(idle_path))[0]
+            report[name] = photoimages_bytes(frames)
+        if self.drag_frames is not None:
+            report["drag"] = photoimages_bytes(self.drag_frames)
+        return report
+
+    def update_cpu_governor(self):
+        """按最近的CPU占用调整周期任务的节流倍数"""
+        self.cpu_governor.update()
+        self.apply_interval_scale()
+        return GOVERNOR_INTERVAL_MS
+
+    def apply_interval_scale(self):
+        """合并CPU调节和省电模式的节流倍数"""
+        scale = self.cpu_governor.scale if self.cpu_governor is not None else 1.0
+        if self.power_saving:
+            scale *= POWER_SAVING_SCALE
+        self.scheduler.interval_scale = min(scale, MAX_INTERVAL_SCALE)
+
+    def check_power(self):
+        """检测电池/全屏状态，按设置切换省电模式"""
+        if self.power_saving_mode == "on":
+            active, reason = True, "手动开启"
+        elif self.power_saving_mode == "off":
+            active, reason = False, ""
+        elif on_battery():
+            active, reason = True, "电池供电"
+        elif foreground_fullscreen((self.hwnd,)):
+            active, reason = True, "全屏程序"
+        else:
+            active, reason = False, ""
+
+        self.power_saving_reason = reason
+        if active != self.power_saving:
+            self.power_saving = active
+            print(f"省电模式{'开启' if active else '关闭'}{'：' + reason if reason else ''}")
+            self.apply_interval_scale()
+        return POWER_CHECK_MS
+
+    def set_power_saving_mode(self, mode):
+        """设置省电模式（auto/on/off）并立即生效"""
+        self.power_saving_mode = mode
+        config = load_config()
+        config["power_saving"] = mode
+        save_config(config)
+        self.scheduler.reschedule("power")
+
+    def power_saving_report(self):
+        """省电模式当前状态"""
+        if self.power_saving:
+            return f"省电中（{self.power_saving_reason}）"
+        return "省电: 未启用"
+
+    def response_cache_report(self):
+        """聊天回复缓存的命中统计"""
+        if self.ai_handler is None or self.ai_handler.response_cache is None:
+            return "回复缓存未启用"
+        return self.ai_handler.response_cache.report()
+
+    def cpu_governor_report(self):
+        """CPU占用和当前节流档位"""
+        if self.cpu_governor is None:
+            return "CPU调节未启用"
+        return self.cpu_governor.report()
+
+    def frame_timing_report(self):
+        """各周期任务的帧计时摘要（延迟/耗时百分位、掉帧数）"""
+        return self.scheduler.timing_report()
+
+    def dump_frame_timing(self, path=FRAME_TIMING_FILE):
+        """把帧计时和调度统计导出为JSON文件"""
+        data = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "scheduler": self.scheduler.stats(),
+            "timing": self.frame_timing_report(),
+        }
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            print(f"帧计时已导出: {path}")
+            return path
+        except Exception as e:
+            print(f"导出帧计时失败: {e}")
+            return None
+
+    def random_idle_gif(self):
+        """随机选择一个idle动画，返回(frames, delays)"""
+        return self.get_idle_gif(self.rng.choice(self.idle_gif_paths))
+
+    def get_idle_gif(self, idle_path):
+        """获取指定idle动画，返回(frames, delays)，首次使用时才解码"""
+        def load():
+            frames, delays, _ = load_gif_frames(
+                idle_path, self.frames_scale, self.refine_resample
+            )
+            return frames, delays
+
+        return self.idle_cache.get(idle_path, load)
+
+    def get_drag_frames(self):
+        """获取drag帧，首次调用时加载"""
+        if self.drag_frames is None:
+            drag_path = resource_path(os.path.join(GIF_DIR, "drag.gif"))
+            self.drag_frames, self.drag_delays, _ = load_gif_frames(
+                drag_path, self.frames_scale, self.refine_resample
+            )
+        return self.drag_frames
+
+    def animation_key(self, frames):
+        """当前帧列表属于哪个动画："move"/"move_left"/"drag"/idle路径，未知返回None"""
+        if frames is None:
+            return None
+        if frames is self.move_frames:
+            return "move"
+        if frames is self.move_frames_left:
+            return "move_left"
+        if frames is self.drag_frames:
+            return "drag"
+        for idle_path, (idle_frames, _) in self.idle_cache.items():
+            if frames is idle_frames:
+                return idle_path
+        return None
+
+    def animation_by_key(self, key):
+        """按animation_key的结果取出(frames, delays)"""
+        if key == "move":
+            return self.move_frames, self.move_delays
+        if key == "move_left":
+            return self.move_frames_left, self.move_delays
+        if key == "drag":
+            frames = self.get_drag_frames()
+            return frames, [1000] * len(frames)
+        return self.get_idle_gif(key)
+
     def init_ai_handler(self, config):
         """初始化AI处理器"""
         try:
             from ai_handler import AIChatHandler, ConfigManager
+            from ai_client import AsyncAIClient
             
             # 加载AI配置
             ai_config_manager = ConfigManager()
@@ -681,7 +1067,19 @@ class PetWindow:
                 api_key = config["api_key"]
             
             if api_key and (ai_enabled or config.get("ai_enabled", False)):
+                # 关闭旧处理器的连接池和事件循环
+                if self.ai_handler is not None:
+                    self.ai_client.close()
+                    self.ai_executor.shutdown()
+                    self.ai_handler.close()
                 self.ai_handler = AIChatHandler(api_key=api_key, config_manager=ai_config_manager)  # 传入config_manager
+                self.ai_executor = RequestExecutor(
+                    max_workers=ai_config_manager.get_ai_max_workers(),
+                    queue_size=ai_config_manager.get_ai_queue_size(),
+                    kind_limits=ai_config_manager.get_kind_limits(),
+                    reserved=ai_config_manager.get_reserved_workers(),
+                )
+                self.ai_client = AsyncAIClient(self.ai_handler, self.ai_executor)
 
                 print("AI处理器初始化成功")
                 
@@ -716,19 +1114,18 @@ class PetWindow:
         
         # 每60秒检查一次（可在配置中调整）
         if current_time - self.last_screenshot_time >= self.screenshot_interval:
-            # 检查条件：AI处理器已初始化且未在分析中
-            if (self.ai_handler and not self.is_analyzing_screenshot and 
-                not self.chat_window.visible and not self.is_paused):
+            # 检查条件：AI处理器已初始化且没有分析在执行或排队
+            if (self.ai_handler and not self.ai_executor.pending(KIND_VL) and 
+                not self.chat_window.visible and not self.is_paused and
+                not self.power_saving):
                 
                 # 检查是否仅在空闲时分析
                 if self.only_analyze_when_idle and self.motion_state != MOTION_REST:
                     pass  # 宠物在运动，跳过分析
                 else:
-                    # 在新线程中进行分析
-                    threading.Thread(
-                        target=self.analyze_screenshot_and_chat,
-                        daemon=True
-                    ).start()
+                    # 以后台优先级提交，用户聊天会优先执行
+                    if self.ai_executor.submit(KIND_VL, self.analyze_screenshot_and_chat) is None:
+                        print("AI请求队列已满，跳过本次截图分析")
             
             self.last_screenshot_time = current_time
         
@@ -737,11 +1134,9 @@ class PetWindow:
 
     def analyze_screenshot_and_chat(self):
         """截图分析并自动发起话题"""
-        if not self.ai_handler or self.is_analyzing_screenshot:
+        if not self.ai_handler:
             return
         
-        self.is_analyzing_screenshot = True
-        
         try:
             # 让AI分析截图
             analysis_result = self.ai_handler.analyze_screenshot(
@@ -752,8 +1147,8 @@ class PetWindow:
                 # 保存分析结果
                 self.last_analysis_result = analysis_result
                 
-                # 在主线程中显示分析结果
-                self.root.after(0, lambda: self.show_analysis_result(analysis_result))
+                # 经命令队列回到Tk线程显示分析结果
+                self.commands.post(self.show_analysis_result, analysis_result)
                 
                 print(f"截图分析结果: {analysis_result[:50]}...")
             else:
@@ -761,8 +1156,6 @@ class PetWindow:
                 
         except Exception as e:
             print(f"截图分析出错: {e}")
-        finally:
-            self.is_analyzing_screenshot = False
 
     def show_analysis_result(self, analysis_result):
         """显示截图分析结果"""
@@ -811,17 +1204,31 @@ class PetWindow:
                 is_ai=True
             ))
     
-    def update_chat_position(self):
-        """更新聊天窗口位置"""
-        if self.chat_window.visible:
-            self.chat_window.update_position()
-        
-        # 继续更新位置
-        self.root.after(100, self.update_chat_position)
+    def queue_geometry(self, window, geometry):
+        """登记窗口的新geometry，等flush_geometry统一提交"""
+        self._pending_geometry[window] = geometry
+
+    def flush_geometry(self):
+        """一次性提交本帧所有待更新的geometry"""
+        pending, self._pending_geometry = self._pending_geometry, {}
+        for window, geometry in pending.items():
+            window.geometry(geometry)
+
+    def sync_geometry(self):
+        """宠物整数位置或大小变化时，连同聊天窗口一起更新geometry"""
+        ix, iy = int(self.x), int(self.y)
+        pos = (ix, iy, self.w, self.h)
+        if pos != self._last_pos:
+            self._last_pos = pos
+            self.queue_geometry(self.root, f"{self.w}x{self.h}+{ix}+{iy}")
+            if self.chat_window.visible:
+                self.chat_window.update_position(flush=False)
+        self.flush_geometry()
 
     def ensure_topmost(self):
         """轻量级置顶轮询"""
-        if not self.is_paused:
+        # 隐藏时不置顶（SWP_SHOWWINDOW会把窗口重新显示出来）
+        if not self.is_paused and not self.is_hidden:
             try:
                 ctypes.windll.user32.SetWindowPos(
                     self.hwnd,
@@ -834,19 +1241,25 @@ class PetWindow:
                 )
             except:
                 pass
-        self.root.after(2000, self.ensure_topmost)
+        return 2000
 
-    def check_quit(self):
-        """主线程轮询退出标志"""
-        if self._request_quit:
-            try:
-                if hasattr(self, "app") and self.app:
-                    self.app.stop()
-            except:
-                pass
-            self.root.destroy()
-            return
-        self.root.after(100, self.check_quit)
+    def quit(self):
+        """退出程序（在Tk线程中执行）"""
+        self.commands.close()
+        try:
+            if hasattr(self, "app") and self.app:
+                self.app.stop()
+        except:
+            pass
+        self._scale_executor.shutdown(wait=False, cancel_futures=True)
+        if self.scale_pyramid is not None:
+            self._pyramid_executor.shutdown(wait=False, cancel_futures=True)
+        self.scheduler.stop()
+        if self.ai_handler is not None:
+            self.ai_client.close()
+            self.ai_executor.shutdown()
+            self.ai_handler.close()
+        self.root.destroy()
 
     def set_click_through(self, enable):
         """设置鼠标穿透"""
@@ -884,21 +1297,102 @@ class PetWindow:
             self.frame_index = 0
 
     def set_scale(self, index):
-        """设置缩放"""
+        """设置缩放（重采样在后台线程进行，旧帧继续播放直到新帧就绪）"""
         self.scale_index = index
         self.scale = SCALE_OPTIONS[index]
         config = load_config()
         config["scale_index"] = index
         save_config(config)
 
-        # 重新加载GIF
-        self.load_gifs()
+        self.start_rescale(parallel=self.parallel_decode)
+
+    def start_rescale(self, parallel=False, preview_first=True):
+        """在后台线程为self.scale生成新帧，完成后回到Tk线程替换
+
+        双档模式下若没有高质量缓存，会先送出一版预览帧，再送出高质量帧。
+        """
+        # 新请求取代所有进行中的请求
+        self._scale_generation += 1
+        generation = self._scale_generation
+        if self._scale_future is not None:
+            self._scale_future.cancel()
+
+        scale = self.scale
+        idle_paths = self.idle_cache.keys()
+        move_path = resource_path(os.path.join(GIF_DIR, "move.gif"))
+
+        # 金字塔命中：无需重采样，直接替换
+        if self.scale_pyramid is not None:
+            frame_set = self.scale_pyramid.get(scale)
+            if frame_set is not None:
+                self.root.after(0, lambda: self.swap_frame_set(frame_set, generation))
+                return
+
+        def is_current():
+            return generation == self._scale_generation
+
+        def post(frame_set):
+            # 经命令队列回到Tk线程替换帧
+            self.commands.post(self.swap_frame_set, frame_set, generation)
+
+        def rescale():
+            if not is_current():
+                return
+            try:
+                if (
+                    preview_first
+                    and self.two_tier_resample
+                    and not frame_cache_valid(move_path, scale, self.refine_resample)
+                ):
+                    preview_set = decode_frame_set(
+                        scale, idle_paths, is_current,
+                        resample=self.preview_resample, preview=True,
+                    )
+                    if preview_set is None or not is_current():
+                        return
+                    post(preview_set)
+                frame_set = decode_frame_set(
+                    scale, idle_paths, is_current, parallel=parallel,
+                    resample=self.refine_resample,
+                )
+            except Exception as e:
+                print(f"重新缩放GIF失败: {e}")
+                return
+            if frame_set is not None and is_current():
+                post(frame_set)
+
+        self._scale_future = self._scale_executor.submit(rescale)
+
+    def swap_frame_set(self, frame_set, generation):
+        """在Tk线程中原子替换为新缩放的帧"""
+        if generation != self._scale_generation:
+            return  # 已被更新的缩放请求取代
+
+        # 同一缩放的预览帧→高质量帧：保持当前动画和帧序号，画面不跳变
+        refine = (
+            self.frames_preview
+            and not frame_set["preview"]
+            and frame_set["scale"] == self.frames_scale
+        )
+        current_key = self.animation_key(self.current_frames) if refine else None
+        pre_drag_key = self.animation_key(self._pre_drag_frames) if refine else None
+
+        self.apply_frame_set(frame_set)
 
         # 更新窗口大小
         if self.move_frames:
             self.w = self.move_frames[0].width()
             self.h = self.move_frames[0].height()
-            self.root.geometry(f"{self.w}x{self.h}+{int(self.x)}+{int(self.y)}")
+            self.sync_geometry()
+
+        if current_key is not None:
+            self.current_frames, self.current_delays = self.animation_by_key(current_key)
+            self.frame_index %= len(self.current_frames)
+            if pre_drag_key is not None:
+                self._pre_drag_frames, self._pre_drag_delays = self.animation_by_key(
+                    pre_drag_key
+                )
+            return
 
         # 重置帧索引，切换到move帧
         self.frame_index = 0
@@ -906,6 +1400,12 @@ class PetWindow:
             self.move_frames if self.moving_right else self.move_frames_left
         )
         self.current_delays = self.move_delays
+        if self.dragging:
+            # 拖动中：保持drag帧，松手后恢复为新缩放的move帧
+            self._pre_drag_frames = self.current_frames
+            self._pre_drag_delays = self.current_delays
+            self.current_frames = self.get_drag_frames()
+            self.current_delays = [1000] * len(self.current_frames)
 
     def toggle_pause(self):
         """切换暂停/继续"""
@@ -913,7 +1413,7 @@ class PetWindow:
         if self.is_paused:
             # 暂停：停止移动，切换到idle动画
             self.is_moving = False
-            frames, delays = random.choice(self.idle_gifs)
+            frames, delays = self.random_idle_gif()
             self.current_frames = frames
             self.current_delays = delays
             self.frame_index = 0
@@ -925,6 +1425,25 @@ class PetWindow:
             )
             self.current_delays = self.move_delays
             self.frame_index = 0
+        self.wake_loops()
+
+    def toggle_visible(self):
+        """切换隐藏/显示"""
+        if self.is_hidden:
+            self.root.deiconify()
+            self.is_hidden = False
+            self.wake_loops()
+        else:
+            self.root.withdraw()
+            self.is_hidden = True
+
+    def wake_loops(self):
+        """状态变化后立即唤醒被降频的animate/move循环"""
+        # 低频等待的时间不计入位移
+        self._last_move_time = None
+        if self.adaptive_tick:
+            self.scheduler.reschedule("animate")
+            self.scheduler.reschedule("move")
 
     def start_drag(self, event):
         """开始拖动（鼠标穿透关闭时才可用）"""
@@ -938,8 +1457,8 @@ class PetWindow:
         self._pre_drag_frames = self.current_frames
         self._pre_drag_delays = self.current_delays
         # 切换到drag静态帧（只显示第一帧）
-        self.current_frames = self.drag_frames
-        self.current_delays = [1000] * len(self.drag_frames)
+        self.current_frames = self.get_drag_frames()
+        self.current_delays = [1000] * len(self.current_frames)
         self.frame_index = 0
         self.label.config(image=self.current_frames[0])
 
@@ -949,299 +1468,68 @@ class PetWindow:
             # 窗口左上角 = 鼠标当前位置 - 偏移量
             self.x = event.x_root - self.drag_start_x
             self.y = event.y_root - self.drag_start_y
-            self.root.geometry(f"+{int(self.x)}+{int(self.y)}")
+            self.sync_geometry()
 
-    def switch_to_idle(self):
-        """切换到随机idle状态（随机停下功能）"""
-        if self.is_paused:
-            return
+    # ============ 运动系统方法 ============
 
-        # 有一定概率直接停在原地，不播放动画
-        if random.random() < STAY_PUT_CHANCE:
-            # 停在原地：关闭移动，但不播放 idle 动画
-            self.is_moving = False
-            # 停止一段时间后恢复移动
-            stop_duration = random.randint(STOP_DURATION_MIN, STOP_DURATION_MAX)
-            self.root.after(stop_duration, self.switch_to_move)
-        else:
-            # 播放 idle 动画
-            self.is_moving = False
-            frames, delays = random.choice(self.idle_gifs)
+    def apply_motion_event(self, event):
+        """把运动引擎的事件映射为动画切换"""
+        if event == EVENT_IDLE:
+            frames, delays = self.random_idle_gif()
             self.current_frames = frames
             self.current_delays = delays
             self.frame_index = 0
-            # 随机停止一段时间后恢复移动
-            stop_duration = random.randint(STOP_DURATION_MIN, STOP_DURATION_MAX)
-            self.root.after(stop_duration, self.switch_to_move)
-
-    def switch_to_move(self):
-        """切换到移动状态"""
-        if self.is_paused:
-            return
-        self.is_moving = True
-        self.current_frames = (
-            self.move_frames if self.moving_right else self.move_frames_left
-        )
-        self.current_delays = self.move_delays
-        self.frame_index = 0
-
-    # ============ 运动系统方法 ============
-
-    def get_random_target(self):
-        """获取随机目标点（偶尔在屏幕外，触发边缘效果）"""
-        if random.random() < OUTSIDE_TARGET_CHANCE:
-            side = random.choice(["left", "right", "top", "bottom"])
-            margin = RESPAWN_MARGIN + 50
-            if side == "left":
-                return (-margin, random.randint(0, self.screen_h - self.h))
-            elif side == "right":
-                return (
-                    self.screen_w + margin,
-                    random.randint(0, self.screen_h - self.h),
-                )
-            elif side == "top":
-                return (random.randint(0, self.screen_w - self.w), -margin)
-            else:  # bottom
-                return (
-                    random.randint(0, self.screen_w - self.w),
-                    self.screen_h + margin,
-                )
-        else:
-            return (
-                random.randint(0, self.screen_w - self.w),
-                random.randint(0, self.screen_h - self.h),
+        elif event == EVENT_MOVE:
+            self.current_frames = (
+                self.move_frames if self.moving_right else self.move_frames_left
             )
-
-    def respawn_from_edge(self):
-        """从屏幕边缘外侧重生"""
-        side = random.choice(["left", "right", "top", "bottom"])
-        if side == "left":
-            self.x = -RESPAWN_MARGIN
-            self.y = random.randint(0, self.screen_h - self.h)
-        elif side == "right":
-            self.x = self.screen_w + RESPAWN_MARGIN
-            self.y = random.randint(0, self.screen_h - self.h)
-        elif side == "top":
-            self.y = -RESPAWN_MARGIN
-            self.x = random.randint(0, self.screen_w - self.w)
-        else:  # bottom
-            self.y = self.screen_h + RESPAWN_MARGIN
-            self.x = random.randint(0, self.screen_w - self.w)
-
-        # 给一点入场速度
-        self.vx = random.choice([-3, 3])
-        self.vy = random.randint(-2, 2)
-
-    def handle_edge(self):
-        """处理边缘：反弹或出屏重生"""
-        escaped = False
-
-        # 检测是否出屏
-        if self.x < -self.w or self.x > self.screen_w:
-            escaped = True
-        if self.y < -self.h or self.y > self.screen_h:
-            escaped = True
-
-        if escaped:
-            if random.random() < EDGE_ESCAPE_CHANCE:
-                self.respawn_from_edge()
-                return True
-            else:
-                # 反弹
-                self.vx = -self.vx
-                self.vy = -self.vy
-                # 拉回屏幕内
-                self.x = max(0, min(self.screen_w - self.w, self.x))
-                self.y = max(0, min(self.screen_h - self.h, self.y))
-        return False
+            self.current_delays = self.move_delays
+            self.frame_index = 0
 
     # ============ 动画方法 ============
 
     def animate(self):
+        """播放下一帧，返回到下一帧的间隔(ms)"""
+        # 隐藏时没人看得见，不切帧
+        if self.is_hidden and self.adaptive_tick:
+            return IDLE_TICK_MS
         if not self.current_frames:
-            self.root.after(100, self.animate)
-            return
+            return 100
         # 拖动时不更新帧（静态显示）
         if self.dragging:
-            self.root.after(50, self.animate)
-            return
+            return 50
         self.label.config(image=self.current_frames[self.frame_index])
         delay = self.current_delays[self.frame_index] if self.current_delays else 100
 
         self.frame_index = (self.frame_index + 1) % len(self.current_frames)
-        self.root.after(delay, self.animate)
+        return delay
 
     def move(self):
-        """运动状态机主循环（性能优化版）"""
-        # 暂停时停止所有运动
+        """推进运动引擎并渲染位置，返回下次间隔(ms)"""
+        # ============ 实际经过时间 ============
+        # 暂停、拖动期间也更新时间戳，恢复后不会把停顿时间算进位移
+        now = time.monotonic()
+        last = self._last_move_time
+        self._last_move_time = now
+        dt_ms = MOVE_INTERVAL if last is None else (now - last) * 1000
+
+        # 隐藏或暂停时停止所有运动（自适应模式下降为低频检查）
+        if self.is_hidden and self.adaptive_tick:
+            return IDLE_TICK_MS
         if self.is_paused:
-            self.root.after(100, self.move)
-            return
+            return IDLE_TICK_MS if self.adaptive_tick else 100
 
         # 拖动时停止自动运动
         if self.dragging:
-            self.root.after(50, self.move)
-            return
+            return 50
 
-        # ============ 随机停下休息（游荡模式专属） ============
-        if self.motion_state == MOTION_WANDER and self.is_moving:
-            if random.random() < STOP_CHANCE:
-                self.switch_to_idle()
-                self.root.after(MOVE_INTERVAL, self.move)
-                return
+        event = motion_step(self.motion, dt_ms, self.rng, self.pointer.sample)
+        self.apply_motion_event(event)
 
-        # ============ 休息状态 ============
-        if self.motion_state == MOTION_REST:
-            self.rest_timer -= MOVE_INTERVAL
-            if self.rest_timer <= 0:
-                # 休息结束，恢复游荡
-                self.motion_state = MOTION_WANDER
-                self.target_x, self.target_y = self.get_random_target()
-                self.target_timer = random.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
-                self.switch_to_move()
-            self.root.after(MOVE_INTERVAL, self.move)
-            return
-
-        # ============ 鼠标位置缓存 ============
-        mx = self.root.winfo_pointerx()
-        my = self.root.winfo_pointery()
-        mouse_moved = (mx, my) != getattr(self, "_last_mouse", (mx, my))
-        self._last_mouse = (mx, my)
-
-        # ============ 计算到目标的距离 ============
-        dx = self.target_x - self.x
-        dy = self.target_y - self.y
-        dist = (dx * dx + dy * dy) ** 0.5
-
-        # ============ 状态判断与切换 ============
-
-        # 如果关闭了跟随模式，强制重置为游荡模式
-        if not self.follow_mouse and self.motion_state in (
-            MOTION_FOLLOW,
-            MOTION_CURIOUS,
-        ):
-            self.motion_state = MOTION_WANDER
-
-        # 跟随模式：根据距离切换follow/curious
-        if self.follow_mouse:
-            dist_mouse = ((mx - self.x) ** 2 + (my - self.y) ** 2) ** 0.5
-
-            if dist_mouse > FOLLOW_START_DIST:
-                self.motion_state = MOTION_FOLLOW
-            elif dist_mouse < FOLLOW_STOP_DIST:
-                self.motion_state = MOTION_CURIOUS
-
-        # 游荡模式：到达目标后决定是否休息
-        elif self.motion_state == MOTION_WANDER and dist < REST_DISTANCE:
-            if random.random() < REST_CHANCE:
-                # 休息一下
-                self.motion_state = MOTION_REST
-                self.rest_timer = random.randint(REST_DURATION_MIN, REST_DURATION_MAX)
-                self.switch_to_idle()
-                self.root.after(MOVE_INTERVAL, self.move)
-                return
-            else:
-                # 继续游荡，换个目标
-                self.target_x, self.target_y = self.get_random_target()
-                self.target_timer = random.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
-
-        # ============ 定时更换目标（仅游荡模式） ============
-        if self.motion_state == MOTION_WANDER:
-            self.target_timer -= 1
-            if self.target_timer <= 0:
-                self.target_x, self.target_y = self.get_random_target()
-                self.target_timer = random.randint(TARGET_CHANGE_MIN, TARGET_CHANGE_MAX)
-
-        # ============ 计算速度倍率 ============
-        if self.motion_state == MOTION_WANDER:
-            speed_mul = SPEED_WANDER
-        elif self.motion_state == MOTION_FOLLOW:
-            speed_mul = SPEED_FOLLOW
-        elif self.motion_state == MOTION_CURIOUS:
-            speed_mul = SPEED_CURIOUS
-        else:
-            speed_mul = 1.0
-
-        # ============ 跟随/好奇模式：只在鼠标移动时更新目标 ============
-        if self.motion_state in (MOTION_FOLLOW, MOTION_CURIOUS):
-            if mouse_moved:  # 只有鼠标移动时才更新目标
-                if self.motion_state == MOTION_FOLLOW:
-                    offset = FOLLOW_DISTANCE
-                else:  # curious
-                    offset = FOLLOW_STOP_DIST
-                self.target_x = mx + random.randint(-offset, offset)
-                self.target_y = my + random.randint(-offset, offset)
-
-                # 重新计算距离
-                dx = self.target_x - self.x
-                dy = self.target_y - self.y
-                dist = max(1, (dx * dx + dy * dy) ** 0.5)
-
-        # ============ 朝目标移动（惯性 + 意图） ============
-        desired_vx = dx / dist * SPEED_X * speed_mul
-        desired_vy = dy / dist * SPEED_Y * speed_mul
-
-        # 惯性融合
-        self.vx = self.vx * INERTIA_FACTOR + desired_vx * INTENT_FACTOR
-        self.vy = self.vy * INERTIA_FACTOR + desired_vy * INTENT_FACTOR
-
-        # ============ 抖动降频：每N帧更新一次 ============
-        if not hasattr(self, "_move_tick"):
-            self._move_tick = 0
-        self._move_tick += 1
-
-        if self._move_tick % JITTER_INTERVAL == 0:
-            self._jitter_x = random.uniform(-JITTER, JITTER)
-            self._jitter_y = random.uniform(-JITTER, JITTER)
-        self.vx += getattr(self, "_jitter_x", 0)
-        self.vy += getattr(self, "_jitter_y", 0)
-
-        # 应用移动
-        self.x += self.vx
-        self.y += self.vy
-
-        # ============ 边缘处理 ============
-        if not self.handle_edge():
-            # 没出屏时才检查边界碰撞
-            hit_edge = False
-            if self.x <= 0:
-                self.x = 0
-                self.vx = abs(self.vx)  # 向右反弹
-                hit_edge = True
-            elif self.x + self.w >= self.screen_w:
-                self.x = self.screen_w - self.w
-                self.vx = -abs(self.vx)  # 向左反弹
-                hit_edge = True
-
-            if self.y <= 0:
-                self.y = 0
-                self.vy = abs(self.vy)  # 向下
-                hit_edge = True
-            elif self.y + self.h >= self.screen_h:
-                self.y = self.screen_h - self.h
-                self.vy = -abs(self.vy)  # 向上
-                hit_edge = True
-
-            # 撞边时更新方向状态
-            new_moving_right = self.vx > 0.5
-            new_moving_left = self.vx < -0.5
-
-            if new_moving_right and not self.moving_right:
-                self.moving_right = True
-                self.current_frames = self.move_frames
-                self.current_delays = self.move_delays
-                self.frame_index = 0
-            elif new_moving_left and self.moving_right:
-                self.moving_right = False
-                self.current_frames = self.move_frames_left
-                self.current_delays = self.move_delays
-                self.frame_index = 0
-
-        # 只在位置明显变化时更新geometry
-        ix, iy = int(self.x), int(self.y)
-        last_pos = getattr(self, "_last_pos", None)
-        if (ix, iy) != last_pos:
-            self.root.geometry(f"+{ix}+{iy}")
-            self._last_pos = (ix, iy)
+        # 只在整数位置变化时更新geometry（聊天窗口随之移动）
+        self.sync_geometry()
 
-        self.root.after(MOVE_INTERVAL, self.move)
\ No newline at end of file
+        # 休息期间位置不变，自适应模式下直接等到休息结束（截止时间，不参与节流）
+        if self.adaptive_tick and self.motion.mode == MOTION_REST:
+            return ExactInterval(max(MOVE_INTERVAL, int(self.motion.rest_left)))
+        return MOVE_INTERVAL
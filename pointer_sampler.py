@@ -0,0 +1,35 @@
+﻿"""共享的鼠标位置采样服务"""
+import time
+
+# 两次实际查询之间的最短间隔(ms)，期间返回缓存的位置
+POINTER_SAMPLE_MS = 50
+
+
+class PointerSampler:
+    """用一次winfo_pointerxy查询鼠标位置，并按最短间隔限频缓存
+
+    所有需要鼠标位置的地方都通过sample()读取同一份采样；只有调用sample()时
+    才会查询，没有人需要鼠标位置时不产生任何开销。只能在Tk线程中调用。
+    """
+
+    def __init__(self, root, min_interval_ms=POINTER_SAMPLE_MS, clock=time.monotonic):
+        self.root = root
+        self.min_interval = min_interval_ms / 1000
+        self.clock = clock
+        self.position = None  # 最近一次采样的(x, y)
+        self._sampled_at = None
+        self.queries = 0  # 实际查询次数
+        self.requests = 0  # sample()调用次数
+
+    def sample(self):
+        """返回鼠标屏幕坐标(x, y)，距上次查询不足最短间隔时返回缓存"""
+        self.requests += 1
+        now = self.clock()
+        if self._sampled_at is None or now - self._sampled_at >= self.min_interval:
+            self.position = self.root.winfo_pointerxy()
+            self._sampled_at = now
+            self.queries += 1
+        return self.position
+
+    def __call__(self):
+        return self.sample()
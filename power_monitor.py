@@ -0,0 +1,107 @@
+﻿"""电源状态检测：是否使用电池供电、前台是否有全屏程序"""
+import ctypes
+import glob
+import os
+import sys
+
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+# 电池处于这些状态说明接着外部电源
+AC_BATTERY_STATUSES = ("Charging", "Full", "Not charging")
+
+
+class SYSTEM_POWER_STATUS(ctypes.Structure):
+    _fields_ = [
+        ("ACLineStatus", ctypes.c_ubyte),
+        ("BatteryFlag", ctypes.c_ubyte),
+        ("BatteryLifePercent", ctypes.c_ubyte),
+        ("SystemStatusFlag", ctypes.c_ubyte),
+        ("BatteryLifeTime", ctypes.c_ulong),
+        ("BatteryFullLifeTime", ctypes.c_ulong),
+    ]
+
+
+class RECT(ctypes.Structure):
+    _fields_ = [
+        ("left", ctypes.c_long),
+        ("top", ctypes.c_long),
+        ("right", ctypes.c_long),
+        ("bottom", ctypes.c_long),
+    ]
+
+
+def _read_sysfs(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def linux_on_battery(power_supply_dir=POWER_SUPPLY_DIR):
+    """根据/sys/class/power_supply判断是否使用电池，无法判断时返回None
+
+    只有本机电池报告Discharging才算电池供电；任何外部电源（Mains、USB、USB_C等）
+    在线，或电池在充电/已充满，都算接着外部电源。
+    """
+    discharging = False
+    for supply in glob.glob(os.path.join(power_supply_dir, "*")):
+        supply_type = _read_sysfs(os.path.join(supply, "type"))
+        if supply_type == "Battery":
+            # scope=Device是无线鼠标、手柄等外设的电池，与本机供电无关
+            if _read_sysfs(os.path.join(supply, "scope")) == "Device":
+                continue
+            status = _read_sysfs(os.path.join(supply, "status"))
+            if status in AC_BATTERY_STATUSES:
+                return False
+            if status == "Discharging":
+                discharging = True
+        elif _read_sysfs(os.path.join(supply, "online")) == "1":
+            return False
+    return True if discharging else None
+
+
+def windows_on_battery():
+    """GetSystemPowerStatus：ACLineStatus为0表示使用电池，无法判断时返回None"""
+    status = SYSTEM_POWER_STATUS()
+    if not ctypes.windll.kernel32.GetSystemPowerStatus(ctypes.byref(status)):
+        return None
+    if status.ACLineStatus == 255:  # 未知
+        return None
+    return status.ACLineStatus == 0
+
+
+def on_battery():
+    """是否正在使用电池供电；台式机或无法判断时返回None"""
+    try:
+        if sys.platform == "win32":
+            return windows_on_battery()
+        if sys.platform.startswith("linux"):
+            return linux_on_battery()
+    except Exception as e:
+        print(f"检测电源状态失败: {e}")
+    return None
+
+
+def foreground_fullscreen(own_hwnds=()):
+    """前台窗口（不是自己、桌面或任务栏）是否铺满整个屏幕，仅支持Windows"""
+    if sys.platform != "win32":
+        return False
+    try:
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd or hwnd in own_hwnds:
+            return False
+        if hwnd in (user32.GetDesktopWindow(), user32.GetShellWindow()):
+            return False
+        rect = RECT()
+        if not user32.GetWindowRect(hwnd, ctypes.byref(rect)):
+            return False
+        screen_w = user32.GetSystemMetrics(0)  # SM_CXSCREEN
+        screen_h = user32.GetSystemMetrics(1)  # SM_CYSCREEN
+        return (
+            rect.left <= 0 and rect.top <= 0
+            and rect.right >= screen_w and rect.bottom >= screen_h
+        )
+    except Exception as e:
+        print(f"检测全屏窗口失败: {e}")
+        return False
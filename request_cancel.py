@@ -0,0 +1,99 @@
+﻿"""可取消的requests请求：取消时直接关闭请求正在使用的socket"""
+import socket
+import threading
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 当前线程正在执行的RequestCancel，由cancel_scope设置
+_scope = threading.local()
+
+
+def abort_connection(conn):
+    """立即关闭连接的socket，阻塞在connect/recv中的线程会马上收到异常"""
+    sock = getattr(conn, "sock", None)
+    if sock is None:
+        return
+    try:
+        # 绕过SSLSocket.shutdown，不去动读线程正在使用的SSL对象
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class RequestCancel:
+    """一次请求的取消句柄，接口与threading.Event兼容（set/is_set）
+
+    在cancel_scope中发出的请求会把取到的连接登记到这里；set()时关闭这些连接，
+    正在等待响应或读取SSE流的线程立即出错返回，不必等服务器回复。请求结束后
+    连接回到连接池前会被注销，之后再set()不会影响其他请求。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._conns = []
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        """取消请求并关闭其连接（任意线程可调用）"""
+        with self._lock:
+            self._event.set()
+            for conn in self._conns:
+                abort_connection(conn)
+
+    def attach(self, conn):
+        with self._lock:
+            self._conns.append(conn)
+            if self._event.is_set():
+                abort_connection(conn)
+
+    def detach_all(self):
+        with self._lock:
+            self._conns.clear()
+
+
+@contextmanager
+def cancel_scope(cancel):
+    """在该范围内当前线程取到的连接都登记到cancel（普通Event或None时不登记）"""
+    if not isinstance(cancel, RequestCancel):
+        yield
+        return
+    previous = getattr(_scope, "cancel", None)
+    _scope.cancel = cancel
+    try:
+        yield
+    finally:
+        _scope.cancel = previous
+        cancel.detach_all()
+
+
+class _TrackedPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        cancel = getattr(_scope, "cancel", None)
+        if cancel is not None:
+            cancel.attach(conn)
+        return conn
+
+
+class TrackedHTTPConnectionPool(_TrackedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class TrackedHTTPSConnectionPool(_TrackedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class CancellableHTTPAdapter(HTTPAdapter):
+    """连接池会把取出的连接登记到当前线程的RequestCancel"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TrackedHTTPConnectionPool,
+            "https": TrackedHTTPSConnectionPool,
+        }
@@ -0,0 +1,139 @@
+﻿"""聊天回复缓存：相同请求直接返回上次的回复，内存LRU + 磁盘持久化"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_FILE = "response_cache.json"
+RESPONSE_CACHE_TTL = 24 * 3600  # 缓存有效期（秒）
+RESPONSE_CACHE_SIZE = 200  # 最多缓存的回复条数
+# 温度高于该值时回复本就应该每次不同，默认不走缓存
+RESPONSE_CACHE_MAX_TEMPERATURE = 0
+
+
+def cache_key(payload):
+    """按(model, messages, temperature, max_tokens)计算缓存键"""
+    messages = [
+        {"role": message.get("role"), "content": message.get("content")}
+        for message in payload.get("messages", [])
+    ]
+    material = json.dumps(
+        [payload.get("model"), messages, payload.get("temperature"), payload.get("max_tokens")],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """按请求体缓存聊天回复
+
+    内存中是按最近使用排序的OrderedDict，超过max_entries时淘汰最久未用的条目；
+    每次写入后整体保存到磁盘，启动时加载未过期的条目。温度高于
+    max_temperature的请求直接跳过缓存（计入bypassed）。可在任意线程调用。
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_FILE, ttl=RESPONSE_CACHE_TTL,
+                 max_entries=RESPONSE_CACHE_SIZE,
+                 max_temperature=RESPONSE_CACHE_MAX_TEMPERATURE, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.max_temperature = max_temperature
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (写入时间, 回复)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.load()
+
+    def cacheable(self, payload):
+        """温度不超过上限的请求才走缓存"""
+        temperature = payload.get("temperature")
+        return temperature is None or temperature <= self.max_temperature
+
+    def get(self, payload):
+        """返回缓存的回复，未命中、已过期或不可缓存时返回None"""
+        if not self.cacheable(payload):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = cache_key(payload)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, payload, reply):
+        """缓存一条回复并写入磁盘"""
+        if not reply or not self.cacheable(payload):
+            return
+        key = cache_key(payload)
+        with self._lock:
+            self._entries[key] = (self.clock(), reply)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save_locked()
+
+    def clear(self):
+        """清空缓存和磁盘文件"""
+        with self._lock:
+            self._entries.clear()
+            self._save_locked()
+
+    def load(self):
+        """从磁盘加载未过期的缓存，文件损坏时丢弃整个缓存"""
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # 文件按最近使用顺序保存，末尾是最近用过的
+            now = self.clock()
+            entries = [
+                (item["key"], float(item["time"]), item["reply"])
+                for item in data
+                if now - float(item["time"]) <= self.ttl
+            ]
+            if not all(isinstance(key, str) and isinstance(reply, str)
+                       for key, _, reply in entries):
+                raise ValueError("缓存条目格式不正确")
+        except Exception as e:
+            print(f"加载回复缓存失败，已丢弃: {e}")
+            return
+        with self._lock:
+            for key, saved_at, reply in entries[-self.max_entries:]:
+                self._entries[key] = (saved_at, reply)
+
+    def _save_locked(self):
+        try:
+            data = [
+                {"key": key, "time": saved_at, "reply": reply}
+                for key, (saved_at, reply) in self._entries.items()
+            ]
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存回复缓存失败: {e}")
+
+    def report(self):
+        """托盘菜单显示用的一行摘要"""
+        looked_up = self.hits + self.misses
+        if not looked_up:
+            return f"回复缓存: {len(self._entries)}条 · 暂无查询（跳过{self.bypassed}次）"
+        rate = self.hits / looked_up * 100
+        return (
+            f"回复缓存: 命中{self.hits} / 未命中{self.misses} ({rate:.0f}%)"
+            f" · 跳过{self.bypassed}"
+        )
@@ -0,0 +1,50 @@
+﻿"""parallel_decode配置必须能从缩放切换一路走到进程池解码"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frame_loader
+import pet_window
+
+
+def gif(name):
+    return pet_window.resource_path(os.path.join(pet_window.GIF_DIR, f"{name}.gif"))
+
+
+def test_decode_frame_set_uses_pool_for_resident_idle(monkeypatch):
+    calls = []
+
+    def fake_parallel(gif_paths, scale, resample):
+        calls.append(list(gif_paths))
+        return {path: ([], []) for path in gif_paths}
+
+    monkeypatch.setattr(pet_window, "load_scaled_frames_parallel", fake_parallel)
+    frame_set = pet_window.decode_frame_set(1.0, [gif("idle1")], parallel=True)
+
+    assert calls == [[gif("move"), gif("idle1")]]
+    assert list(frame_set["idle"]) == [gif("idle1")]
+
+
+def test_set_scale_forwards_parallel_decode(monkeypatch):
+    monkeypatch.setattr(pet_window, "load_config", lambda: {})
+    monkeypatch.setattr(pet_window, "save_config", lambda config: None)
+    window = pet_window.PetWindow.__new__(pet_window.PetWindow)
+    window.parallel_decode = True
+    calls = []
+    window.start_rescale = lambda **kwargs: calls.append(kwargs)
+
+    window.set_scale(0)
+
+    assert calls == [{"parallel": True}]
+
+
+def test_parallel_decode_matches_serial(monkeypatch, tmp_path):
+    monkeypatch.setattr(frame_loader, "FRAME_CACHE_DIR", str(tmp_path))
+    scale = pet_window.SCALE_OPTIONS[0]
+    parallel = pet_window.decode_frame_set(scale, [gif("idle1")], parallel=True)
+    serial = frame_loader.load_scaled_frames(gif("idle1"), scale, use_cache=False)
+
+    frames, delays = parallel["idle"][gif("idle1")]
+    assert delays == serial[1]
+    assert [img.tobytes() for img in frames] == [img.tobytes() for img in serial[0]]
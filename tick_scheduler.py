@@ -0,0 +1,254 @@
+﻿"""统一定时调度器：所有周期任务共用一个Tk定时器"""
+import collections
+import heapq
+import itertools
+import time
+
+# 截止时间相差不超过该值的任务在同一次唤醒中执行
+COALESCE_MS = 2
+# 帧计时统计保留的最近样本数（每个任务）
+TIMING_WINDOW = 512
+TIMING_PERCENTILES = (50, 90, 99)
+# 回调抛出异常后至少隔这么久再重试，避免0间隔任务在Tk线程里空转
+ERROR_RETRY_MS = 100
+# 连续出错这么多次后移除任务
+MAX_TASK_ERRORS = 20
+
+
+class TaskTiming:
+    """单个任务的帧计时：最近TIMING_WINDOW次的延迟/耗时样本和掉帧计数
+
+    延迟 = 实际执行时间 - 计划执行时间；延迟超过一个任务间隔记为掉帧。
+    只在记录时做两次deque追加，百分位在查看时才计算。
+    """
+
+    __slots__ = ("late_ms", "duration_ms", "samples", "dropped")
+
+    def __init__(self):
+        self.late_ms = collections.deque(maxlen=TIMING_WINDOW)
+        self.duration_ms = collections.deque(maxlen=TIMING_WINDOW)
+        self.samples = 0
+        self.dropped = 0
+
+    def record(self, late_ms, duration_ms, interval_ms):
+        self.late_ms.append(late_ms)
+        self.duration_ms.append(duration_ms)
+        self.samples += 1
+        if interval_ms and late_ms > interval_ms:
+            self.dropped += int(late_ms // interval_ms)
+
+    def summary(self):
+        """{"samples", "dropped", "late_ms": {p50..}, "duration_ms": {p50..}}"""
+        return {
+            "samples": self.samples,
+            "dropped": self.dropped,
+            "late_ms": percentiles(self.late_ms),
+            "duration_ms": percentiles(self.duration_ms),
+        }
+
+
+class ExactInterval(int):
+    """回调返回的截止型间隔（如"休息结束时唤醒"），不乘interval_scale"""
+
+    __slots__ = ()
+
+
+def percentiles(values):
+    """按最近邻取样计算TIMING_PERCENTILES及最大值"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    result = {f"p{p}": round(ordered[min(last, int(last * p / 100 + 0.5))], 2)
+              for p in TIMING_PERCENTILES}
+    result["max"] = round(ordered[last], 2)
+    return result
+
+
+class TickScheduler:
+    """用优先队列管理周期任务的截止时间
+
+    每次唤醒执行所有已到期（含COALESCE_MS内即将到期）的任务，然后只为最早的
+    下一个截止时间设置一个root.after，代替每个任务各自的after()链。
+    任务回调返回下次间隔(ms)，返回None表示任务结束；返回ExactInterval时
+    按原值排期，不受节流影响。只能在Tk线程中使用。
+    """
+
+    def __init__(self, root, clock=time.monotonic, timing=True):
+        self.root = root
+        self.clock = clock
+        # 任务名 -> TaskTiming，timing为False时不记录
+        self.timing = {} if timing else None
+        self._heap = []  # (deadline, seq, name, version)
+        self._tasks = {}  # name -> {"callback", "interval", "version", "runs"}
+        self._seq = itertools.count()
+        self._after_id = None
+        self._armed_deadline = None
+        self._stopped = False
+        self.wakeups = 0
+        # 可节流任务返回的间隔乘以该倍数（CPU调节器/省电模式用）
+        self.interval_scale = 1.0
+
+    def add(self, name, callback, delay_ms=0, throttle=True, max_interval_ms=None):
+        """注册（或替换）一个周期任务，delay_ms后首次执行
+
+        throttle为False的任务不受interval_scale影响；max_interval_ms限制节流
+        放大后的间隔（回调本身返回的更长间隔不受限制）。
+        """
+        task = self._tasks.get(name)
+        version = task["version"] + 1 if task else 0
+        self._tasks[name] = {
+            "callback": callback,
+            "interval": delay_ms,
+            "version": version,
+            "runs": 0,
+            "errors": 0,  # 连续出错次数
+            "throttle": throttle,
+            "max_interval": max_interval_ms,
+        }
+        self._push(name, delay_ms)
+        self._arm()
+
+    def reschedule(self, name, delay_ms=0):
+        """把任务的下次执行改为delay_ms之后（可提前也可推后）"""
+        task = self._tasks.get(name)
+        if task is None:
+            return False
+        task["version"] += 1
+        self._push(name, delay_ms)
+        self._arm()
+        return True
+
+    def remove(self, name):
+        """移除任务"""
+        if self._tasks.pop(name, None) is not None:
+            self._arm()
+
+    def stop(self):
+        """停止调度（窗口销毁前调用）"""
+        self._stopped = True
+        self._cancel_after()
+
+    def has_task(self, name):
+        return name in self._tasks
+
+    def stats(self):
+        """调度统计：总唤醒次数和每个任务的执行次数、当前间隔"""
+        return {
+            "wakeups": self.wakeups,
+            "tasks": {
+                name: {"runs": task["runs"], "interval_ms": task["interval"]}
+                for name, task in self._tasks.items()
+            },
+        }
+
+    def timing_report(self):
+        """各任务的帧计时摘要，未启用时返回空字典"""
+        if self.timing is None:
+            return {}
+        # 托盘线程也会读取，先复制一份避免字典在迭代中被修改
+        return {name: timing.summary() for name, timing in list(self.timing.items())}
+
+    def reset_timing(self):
+        if self.timing is not None:
+            self.timing.clear()
+
+    def _scaled_interval(self, task):
+        """按interval_scale放大可节流任务的间隔"""
+        interval = task["interval"]
+        if not task["throttle"] or isinstance(interval, ExactInterval):
+            return interval
+        scaled = interval * self.interval_scale
+        if task["max_interval"] is not None:
+            scaled = min(scaled, max(interval, task["max_interval"]))
+        return scaled
+
+    def _push(self, name, delay_ms):
+        task = self._tasks[name]
+        deadline = self.clock() + max(0, delay_ms) / 1000
+        heapq.heappush(self._heap, (deadline, next(self._seq), name, task["version"]))
+
+    def _is_live(self, entry):
+        _, _, name, version = entry
+        task = self._tasks.get(name)
+        return task is not None and task["version"] == version
+
+    def _cancel_after(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+        self._armed_deadline = None
+
+    def _arm(self):
+        """为最早的有效截止时间设置唯一的Tk定时器"""
+        if self._stopped:
+            return
+        # 丢弃已失效的堆顶项（任务被移除或已重新排期）
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._cancel_after()
+            return
+        deadline = self._heap[0][0]
+        if self._after_id is not None and self._armed_deadline == deadline:
+            return
+        self._cancel_after()
+        delay_ms = max(0, int((deadline - self.clock()) * 1000 + 0.5))
+        self._armed_deadline = deadline
+        self._after_id = self.root.after(delay_ms, self._run)
+
+    def _run(self):
+        """一次唤醒：执行所有到期任务"""
+        self._after_id = None
+        self._armed_deadline = None
+        if self._stopped:
+            return
+        self.wakeups += 1
+        horizon = self.clock() + COALESCE_MS / 1000
+        # 本轮执行过的任务在循环结束后再入队，避免0间隔任务在同一轮里反复执行
+        next_runs = []
+        while self._heap and self._heap[0][0] <= horizon:
+            entry = heapq.heappop(self._heap)
+            if not self._is_live(entry):
+                continue
+            name = entry[2]
+            task = self._tasks[name]
+            started = self.clock()
+            try:
+                interval = task["callback"]()
+                task["errors"] = 0
+            except Exception as e:
+                task["errors"] += 1
+                if task["errors"] >= MAX_TASK_ERRORS:
+                    print(f"定时任务{name}连续出错{task['errors']}次，已停止: {e}")
+                    interval = None
+                else:
+                    print(f"定时任务{name}出错: {e}")
+                    interval = max(task["interval"], ERROR_RETRY_MS)
+            task["runs"] += 1
+            if self.timing is not None:
+                timing = self.timing.get(name)
+                if timing is None:
+                    timing = self.timing[name] = TaskTiming()
+                timing.record(
+                    max(0.0, (started - entry[0]) * 1000),
+                    (self.clock() - started) * 1000,
+                    task["interval"],
+                )
+            if self._stopped:
+                return
+            # 回调中可能移除或重新排期了自己
+            if self._tasks.get(name) is not task or task["version"] != entry[3]:
+                continue
+            if interval is None:
+                del self._tasks[name]
+                continue
+            task["interval"] = interval
+            next_runs.append(name)
+        for name in next_runs:
+            task = self._tasks[name]
+            self._push(name, self._scaled_interval(task))
+        self._arm()
@@ -16,13 +16,16 @@ def create_tray_manager(app, root):
         print(f"加载托盘图标失败，使用默认图标: {e}")
         icon_image = PILImage.new("RGB", (64, 64), color="pink")
 
-    # 定义事件处理函数
+    def on_tk(handler):
+        """托盘回调运行在pystray线程，包装后投递到Tk线程执行"""
+        def wrapper(icon, item):
+            app.commands.post(handler, icon, item)
+        return wrapper
+
+    # 定义事件处理函数（通过on_tk在Tk线程中执行）
     def on_toggle_visible(icon, item):
         """切换隐藏/显示"""
-        if app.root.state() == "withdrawn":
-            app.root.deiconify()
-        else:
-            app.root.withdraw()
+        app.toggle_visible()
 
     def on_toggle_pause(icon, item):
         """切换暂停/继续"""
@@ -55,7 +58,7 @@ def create_tray_manager(app, root):
 
     def on_quit(icon):
         """退出"""
-        app._request_quit = True
+        app.commands.post(app.quit)
 
     def on_toggle_click_through(icon, item):
         """切换鼠标穿透"""
@@ -1040,7 +1043,7 @@ def create_tray_manager(app, root):
         for i in range(len(SCALE_OPTIONS)):
             def make_scale_handler(idx):
                 def handler(icon, item):
-                    app.set_scale(idx)
+                    app.commands.post(app.set_scale, idx)
                 return handler
             
             scale_items.append(
@@ -1051,6 +1054,17 @@ def create_tray_manager(app, root):
                     radio=True,
                 )
             )
+
+        # 启用多缩放缓存时显示各缩放的内存占用
+        if getattr(app, "scale_pyramid", None) is not None:
+            scale_items.append(pystray.Menu.SEPARATOR)
+            scale_items.append(
+                pystray.MenuItem(
+                    lambda item: app.scale_cache_report(),
+                    lambda icon, item: None,
+                    enabled=False,
+                )
+            )
         return pystray.Menu(*scale_items)
 
     # 创建透明度菜单项
@@ -1061,7 +1075,7 @@ def create_tray_manager(app, root):
         for i in range(len(TRANSPARENCY_OPTIONS)):
             def make_transparency_handler(idx):
                 def handler(icon, item):
-                    app.set_transparency(idx)
+                    app.commands.post(app.set_transparency, idx)
                 return handler
             
             transparency_items.append(
@@ -1074,39 +1088,107 @@ def create_tray_manager(app, root):
             )
         return pystray.Menu(*transparency_items)
 
+    # 创建帧内存菜单项（每次打开菜单时重新统计）
+    def create_frame_memory_items():
+        report = app.frame_memory_report()
+        items = [
+            pystray.MenuItem(
+                f"{name}: {nbytes / 1024 / 1024:.1f}MB",
+                lambda icon, item: None,
+                enabled=False,
+            )
+            for name, nbytes in report.items()
+        ]
+        total = sum(report.values())
+        items.append(pystray.Menu.SEPARATOR)
+        items.append(
+            pystray.MenuItem(f"合计: {total / 1024 / 1024:.1f}MB", lambda icon, item: None, enabled=False)
+        )
+        return items
+
+    # 创建省电模式菜单项
+    def create_power_saving_items():
+        from pet_window import POWER_SAVING_MODES
+
+        def make_power_saving_handler(mode):
+            def handler(icon, item):
+                app.commands.post(app.set_power_saving_mode, mode)
+            return handler
+
+        items = [
+            pystray.MenuItem(
+                label,
+                make_power_saving_handler(mode),
+                checked=lambda item, mode=mode: app.power_saving_mode == mode,
+                radio=True,
+            )
+            for mode, label in POWER_SAVING_MODES.items()
+        ]
+        items.append(pystray.Menu.SEPARATOR)
+        items.append(
+            pystray.MenuItem(lambda item: app.power_saving_report(), lambda icon, item: None, enabled=False)
+        )
+        return pystray.Menu(*items)
+
+    # 创建帧计时菜单项（每次打开菜单时重新统计）
+    def create_frame_timing_items():
+        report = app.frame_timing_report()
+        items = [
+            pystray.MenuItem(
+                f"{name}: 延迟p50 {summary['late_ms'].get('p50', 0)}ms "
+                f"p99 {summary['late_ms'].get('p99', 0)}ms, "
+                f"耗时p99 {summary['duration_ms'].get('p99', 0)}ms, 掉帧{summary['dropped']}",
+                lambda icon, item: None,
+                enabled=False,
+            )
+            for name, summary in report.items()
+        ]
+        if not items:
+            items.append(pystray.MenuItem("帧计时未启用", lambda icon, item: None, enabled=False))
+            return items
+        items.append(pystray.Menu.SEPARATOR)
+        items.append(pystray.MenuItem("导出JSON", lambda icon, item: app.commands.post(app.dump_frame_timing)))
+        items.append(pystray.MenuItem("重置", lambda icon, item: app.commands.post(app.scheduler.reset_timing)))
+        return items
+
     # 创建菜单
     menu = pystray.Menu(
         pystray.MenuItem(
             "隐藏/显示",
-            on_toggle_visible,
+            on_tk(on_toggle_visible),
         ),
         pystray.MenuItem(
             "暂停/继续",
-            on_toggle_pause,
+            on_tk(on_toggle_pause),
         ),
         pystray.MenuItem(
             "打开聊天",
-            on_toggle_chat,
+            on_tk(on_toggle_chat),
         ),
         pystray.MenuItem(
             "截图分析",
-            on_toggle_screenshot_analysis,
+            on_tk(on_toggle_screenshot_analysis),
             checked=lambda item: app.enable_screenshot_analysis if hasattr(app, 'enable_screenshot_analysis') else False,
         ),
         pystray.MenuItem(
             "跟随鼠标",
-            on_toggle_follow,
+            on_tk(on_toggle_follow),
             checked=lambda item: app.follow_mouse,
         ),
         pystray.MenuItem(
             "鼠标穿透",
-            on_toggle_click_through,
+            on_tk(on_toggle_click_through),
             checked=lambda item: app.click_through,
         ),
-        pystray.MenuItem("AI配置", on_configure_ai),
+        pystray.MenuItem("AI配置", on_tk(on_configure_ai)),
         pystray.MenuItem("缩放", create_scale_items()),
         pystray.MenuItem("透明度", create_transparency_items()),
-        pystray.MenuItem("关于", on_about),
+        pystray.MenuItem("省电模式", create_power_saving_items()),
+        pystray.MenuItem("帧内存", pystray.Menu(create_frame_memory_items)),
+        pystray.MenuItem("帧计时", pystray.Menu(create_frame_timing_items)),
+        pystray.MenuItem(lambda item: app.cpu_governor_report(), lambda icon, item: None, enabled=False),
+        pystray.MenuItem(lambda item: app.response_cache_report(), lambda icon, item: None, enabled=False),
+        pystray.MenuItem("关于", on_tk(on_about)),
         pystray.MenuItem("退出", on_quit),
     )
 